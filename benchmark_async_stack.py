@@ -0,0 +1,137 @@
+"""
+Нагрузочное сравнение синхронного и асинхронного доступа к данным API.
+
+Повторяет работу эндпоинта GET /profile (пользователь по email из Postgres, токен и профиль из Redis)
+при заданном числе одновременных запросов двумя способами:
+- sync: прежний стек - psycopg2 и redis.Redis, вызовы в пуле потоков, как FastAPI выполняет
+  обычные def-эндпоинты (по умолчанию 40 потоков, как у Starlette);
+- async: asyncpg и redis.asyncio в одном цикле событий, как async def-эндпоинты main2.py.
+Печатает пропускную способность, перцентили задержки и число потоков процесса.
+
+Нужны Postgres и Redis из settings (env.env). Тестовый пользователь создается и удаляется скриптом.
+
+Запуск: python benchmark_async_stack.py [--requests 5000] [--concurrency 10 100 500] [--threads 40]
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import repositories.async_users
+import repositories.users
+from repositories.async_connection import close_async_pool
+from repositories.connection import get_connection
+from services.async_redis_service import get_async_redis_service
+from services.redis_service import get_redis_service
+
+BENCH_EMAIL = "bench-async-stack@example.com"
+BENCH_TOKEN = "bench-async-stack-token"
+
+
+def sync_profile_request(redis_service) -> None:
+    user = repositories.users.get_user_by_email(BENCH_EMAIL)[0]
+    assert redis_service.get_token(str(user["user_id"])) == BENCH_TOKEN
+    redis_service.get_cached_data(f"profile:{user['user_id']}")
+
+
+async def async_profile_request(async_redis_service) -> None:
+    user = await repositories.async_users.get_user_by_email(BENCH_EMAIL)
+    assert await async_redis_service.get_token(str(user["user_id"])) == BENCH_TOKEN
+    await async_redis_service.get_cached_data(f"profile:{user['user_id']}")
+
+
+async def run_load(request, total: int, concurrency: int) -> dict:
+    """
+    concurrency клиентов по очереди выполняют запросы, пока их не станет total
+    :param request: корутинная функция одного запроса
+    """
+    latencies = []
+    remaining = iter(range(total))
+    peak_threads = threading.active_count()
+
+    async def client():
+        nonlocal peak_threads
+        for _ in remaining:
+            started = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - started)
+            peak_threads = max(peak_threads, threading.active_count())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "threads": peak_threads,
+    }
+
+
+def seed(redis_service) -> None:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO users (password, email, balance) VALUES ('bench', %s, 0) "
+                "ON CONFLICT (email) DO NOTHING;", (BENCH_EMAIL,)
+            )
+    user = repositories.users.get_user_by_email(BENCH_EMAIL)[0]
+    redis_service.store_token(str(user["user_id"]), BENCH_TOKEN, 600)
+    redis_service.cache_data(f"profile:{user['user_id']}", dict(user), 600)
+
+
+def cleanup(redis_service) -> None:
+    users = repositories.users.get_user_by_email(BENCH_EMAIL)
+    if users:
+        redis_service.delete_token(str(users[0]["user_id"]))
+        redis_service.invalidate_cache(f"profile:{users[0]['user_id']}")
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM users WHERE email = %s;", (BENCH_EMAIL,))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="запросов на одно измерение")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500],
+                        help="числа одновременных запросов")
+    parser.add_argument("--threads", type=int, default=40, help="размер пула потоков синхронного стека")
+    args = parser.parse_args()
+
+    redis_service = get_redis_service()
+    async_redis_service = get_async_redis_service()
+    executor = ThreadPoolExecutor(max_workers=args.threads)
+    loop = asyncio.get_running_loop()
+
+    async def sync_request():
+        await loop.run_in_executor(executor, sync_profile_request, redis_service)
+
+    async def async_request():
+        await async_profile_request(async_redis_service)
+
+    seed(redis_service)
+    try:
+        # Прогрев: соединения обоих пулов открываются до измерений
+        await run_load(sync_request, args.threads, args.threads)
+        await run_load(async_request, 50, 50)
+
+        print(f"{'stack':<6} {'concurrency':>11} {'req/s':>9} {'p50, ms':>8} {'p95, ms':>8} {'p99, ms':>8} {'threads':>8}")
+        for concurrency in args.concurrency:
+            for name, request in (("sync", sync_request), ("async", async_request)):
+                result = await run_load(request, args.requests, concurrency)
+                print(f"{name:<6} {concurrency:>11} {result['rps']:>9.0f} {result['p50']:>8.1f} "
+                      f"{result['p95']:>8.1f} {result['p99']:>8.1f} {result['threads']:>8}")
+    finally:
+        cleanup(redis_service)
+        executor.shutdown()
+        await close_async_pool()
+        await async_redis_service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Замер времени холодного старта точек входа по `python -X importtime`.
+
+Для каждой точки входа запускается отдельный процесс интерпретатора:
+- api: `import main2` (FastAPI-приложение);
+- streamlit: импорты верхнего уровня из main.py (сам скрипт - код интерфейса Streamlit,
+  вне `streamlit run` его не выполнить, а время старта определяется именно импортами).
+Печатает суммарное время импорта (медиана по повторам) и самые долгие модули.
+Завершается с кодом 1, если точка входа импортирует запрещенный для нее модуль
+или превышает бюджет времени.
+
+Запуск: python benchmark_import_time.py [--repeat 5] [--top 10] [--api-budget-ms 0] [--streamlit-budget-ms 0]
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Модули, которые процесс точки входа не должен импортировать при старте
+FORBIDDEN_MODULES = {
+    "api": {"streamlit", "pandas", "sympy", "requests", "thefuzz"},
+    "streamlit": {"sympy", "thefuzz", "fastapi"},
+}
+
+
+def streamlit_imports() -> str:
+    """Операторы import верхнего уровня main.py"""
+    path = os.path.join(ROOT, "main.py")
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source)
+    return "\n".join(
+        ast.get_source_segment(source, node)
+        for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+ENTRY_POINTS = {
+    "api": "import main2",
+    "streamlit": streamlit_imports,
+}
+
+
+def measure(code: str) -> list:
+    """
+    Импортировать код в новом процессе с -X importtime
+    :return: [(модуль, собственное время в мкс, накопленное время в мкс)] в порядке вывода
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="запусков на точку входа")
+    parser.add_argument("--top", type=int, default=10, help="сколько самых долгих модулей показать")
+    parser.add_argument("--api-budget-ms", type=float, default=0, help="бюджет времени импорта API; 0 - без проверки")
+    parser.add_argument("--streamlit-budget-ms", type=float, default=0,
+                        help="бюджет времени импорта Streamlit-приложения; 0 - без проверки")
+    args = parser.parse_args()
+    budgets = {"api": args.api_budget_ms, "streamlit": args.streamlit_budget_ms}
+
+    failures = []
+    for name, code in ENTRY_POINTS.items():
+        if callable(code):
+            code = code()
+        runs = [measure(code) for _ in range(args.repeat)]
+        totals = [sum(self_us for _, self_us, _ in modules) / 1000 for modules in runs]
+        total_ms = statistics.median(totals)
+
+        print(f"\n{name}: {total_ms:.0f} ms (min {min(totals):.0f}, max {max(totals):.0f}, {args.repeat} runs)")
+        modules = runs[totals.index(sorted(totals)[len(totals) // 2])]
+        top_level = {}
+        for module, _, cumulative_us in modules:
+            package = module.split(".")[0]
+            top_level[package] = max(top_level.get(package, 0), cumulative_us)
+        for package, cumulative_us in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {package:<40} {cumulative_us / 1000:>8.1f} ms")
+
+        imported = {module.split(".")[0] for module, _, _ in modules}
+        forbidden = sorted(imported & FORBIDDEN_MODULES[name])
+        if forbidden:
+            failures.append(f"{name}: imports {', '.join(forbidden)}")
+        if budgets[name] and total_ms > budgets[name]:
+            failures.append(f"{name}: {total_ms:.0f} ms exceeds budget of {budgets[name]:.0f} ms")
+
+    if failures:
+        print("\nStartup regressions:")
+        for failure in failures:
+            print(f"- {failure}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
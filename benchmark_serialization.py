@@ -0,0 +1,106 @@
+"""
+Микробенчмарк сериализации значений Redis.
+
+Сравнивает прежний путь (json.dumps в строку, детали продукта - hash строк с разбором
+полей по одному) с services.serialization.Serializer для каждого установленного кодека,
+со сжатием и без. Redis не нужен: измеряются размер значения и время кодирования/декодирования.
+
+Запуск: python benchmark_serialization.py [--repeat 2000]
+"""
+import argparse
+import json
+import timeit
+
+from services import product_cache
+from services.serialization import Serializer, _available_codecs
+
+
+def make_product_details(product_id: int, reviews: int = 20) -> dict:
+    return {
+        'product_id': product_id,
+        'product_name': f'Смартфон модель {product_id}',
+        'price': 29999.99 + product_id,
+        'description': 'Экран 6.5", 8 ГБ ОЗУ, 256 ГБ памяти, аккумулятор 5000 мА·ч. ' * 3,
+        'warranty_period': 24,
+        'stock_quantity': 150 + product_id,
+        'manufacturer_id': 7,
+        'manufacturer_name': 'Производитель',
+        'manufacturer_country': 'Россия',
+        'reviews': [
+            {
+                'review_id': product_id * 100 + i,
+                'rating': i % 5 + 1,
+                'review_text': 'Отличный телефон, быстро работает, батарея держит два дня.',
+                'review_date': '2024-05-17',
+                'user_id': 1000 + i,
+            }
+            for i in range(reviews)
+        ],
+    }
+
+
+PAYLOADS = {
+    'product detail': make_product_details(1),
+    'search results (10 details)': [make_product_details(i) for i in range(10)],
+    'cart item': {'product_id': 3, 'name': 'Смартфон', 'price': 29999.99, 'quantity': 2,
+                  'added_date': '2024-05-17T10:00:00'},
+    'catalog (2000 summaries)': [{'product_id': i, 'name': f'Товар {i}'} for i in range(2000)],
+}
+
+
+def bench(func, repeat: int) -> float:
+    """Среднее время одного вызова в микросекундах"""
+    return min(timeit.repeat(func, number=repeat, repeat=3)) / repeat * 1e6
+
+
+def legacy_detail_hash(details: dict) -> dict:
+    """Как детали продукта хранились раньше: hash, все поля строками, reviews - JSON-строкой"""
+    mapping = {key: str(value) for key, value in details.items()}
+    mapping['reviews'] = json.dumps(details['reviews'])
+    return mapping
+
+
+def legacy_detail_decode(mapping: dict) -> dict:
+    details = dict(mapping)
+    for field, converter in (('price', float), ('stock_quantity', int), ('warranty_period', int),
+                             ('product_id', int), ('manufacturer_id', int)):
+        details[field] = converter(details[field])
+    details['reviews'] = json.loads(details['reviews'])
+    return details
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000, help='вызовов на одно измерение')
+    args = parser.parse_args()
+
+    serializers = {}
+    for codec in _available_codecs():
+        serializers[codec] = Serializer(codec, compression_threshold=0)
+        serializers[f'{codec}+zlib'] = Serializer(codec, compression_threshold=1024)
+
+    print(f"{'payload':<30} {'method':<16} {'bytes':>9} {'encode, us':>11} {'decode, us':>11}")
+    for name, value in PAYLOADS.items():
+        # Прежний путь
+        if name == 'product detail':
+            mapping = legacy_detail_hash(value)
+            size = sum(len(k.encode()) + len(v.encode()) for k, v in mapping.items())
+            encode = bench(lambda: legacy_detail_hash(value), args.repeat)
+            decode = bench(lambda: legacy_detail_decode(mapping), args.repeat)
+            print(f"{name:<30} {'legacy hash':<16} {size:>9} {encode:>11.1f} {decode:>11.1f}")
+        else:
+            encoded = json.dumps(value)
+            encode = bench(lambda: json.dumps(value), args.repeat)
+            decode = bench(lambda: json.loads(encoded), args.repeat)
+            print(f"{name:<30} {'legacy json':<16} {len(encoded.encode()):>9} {encode:>11.1f} {decode:>11.1f}")
+
+        for method, serializer in serializers.items():
+            schema = product_cache.DETAIL_SCHEMA if name == 'product detail' else 'benchmark.v1'
+            data = serializer.dumps(value, schema)
+            encode = bench(lambda: serializer.dumps(value, schema), args.repeat)
+            decode = bench(lambda: serializer.loads(data, schema), args.repeat)
+            print(f"{'':<30} {method:<16} {len(data):>9} {encode:>11.1f} {decode:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+"""
+Проверка планов запросов на регрессии индексов.
+
+Засевает базу тестовыми данными, вызывает функции из repositories/ и services/orders.py
+(асинхронные функции repositories/async_users.py - через то же соединение psycopg2),
+для каждого выполненного ими запроса снимает EXPLAIN и завершается с кодом 1,
+если горячий запрос читает большую таблицу последовательным сканированием (Seq Scan).
+Все изменения выполняются в одной транзакции и откатываются в конце.
+
+Запуск: python check_query_plans.py
+"""
+import asyncio
+import re
+import sys
+from contextlib import asynccontextmanager, contextmanager
+
+import psycopg2
+import psycopg2.extras
+from settings import DB_CONFIG
+
+import repositories.admin
+import repositories.async_users
+import repositories.cart
+import repositories.products
+import repositories.users
+import services.orders
+
+# Модули с асинхронными запросами (asyncpg, get_async_connection)
+ASYNC_PATCHED_MODULES = [
+    repositories.async_users,
+]
+
+# Таблицы, которые растут вместе с нагрузкой; полный проход по ним считается регрессией
+HOT_RELATIONS = {"users", "products", "carts", "orders", "order_items", "reviews"}
+
+PATCHED_MODULES = [
+    repositories.admin,
+    repositories.cart,
+    repositories.products,
+    repositories.users,
+    services.orders,
+]
+
+SEED_QUERIES = [
+    """
+    INSERT INTO manufacturers (name, country)
+    SELECT 'plan-check-manufacturer-' || g, 'Country' FROM generate_series(1, 50) g;
+    """,
+    """
+    INSERT INTO users (password, email, balance)
+    SELECT 'plan-check', 'plan-check-' || g || '@example.com', 1000000 FROM generate_series(1, 5000) g;
+    """,
+    """
+    INSERT INTO products (name, price, description, warranty_period, manufacturer_id, stock_quantity)
+    SELECT 'Plan check product ' || g, (g % 500) + 1, 'Plan check', 12,
+           (SELECT MIN(manufacturer_id) FROM manufacturers), 1000 + g
+    FROM generate_series(1, 20000) g;
+    """,
+    """
+    INSERT INTO orders (user_id, order_date, status)
+    SELECT u.user_id, NOW() - (g || ' minutes')::interval, 'Pending'
+    FROM generate_series(1, 50000) g
+    JOIN LATERAL (
+        SELECT user_id FROM users WHERE email = 'plan-check-' || (g % 5000 + 1) || '@example.com'
+    ) u ON TRUE;
+    """,
+    """
+    INSERT INTO order_items (order_id, product_id, quantity)
+    SELECT o.order_id, p.product_id, 1
+    FROM (SELECT order_id, ROW_NUMBER() OVER (ORDER BY order_id) AS rn FROM orders) o
+    JOIN (SELECT product_id, ROW_NUMBER() OVER (ORDER BY product_id) AS rn FROM products) p
+        ON p.rn = o.rn % 20000 + 1;
+    """,
+    """
+    INSERT INTO reviews (product_id, user_id, rating, review_text, review_date)
+    SELECT p.product_id, u.user_id, 5, 'Plan check', CURRENT_DATE
+    FROM (SELECT product_id, ROW_NUMBER() OVER (ORDER BY product_id) AS rn FROM products) p
+    JOIN (SELECT user_id, ROW_NUMBER() OVER (ORDER BY user_id) AS rn FROM users) u
+        ON u.rn = p.rn % 5000 + 1;
+    """,
+    """
+    INSERT INTO carts (user_id, product_id, quantity)
+    SELECT u.user_id, p.product_id, 1
+    FROM (SELECT user_id, ROW_NUMBER() OVER (ORDER BY user_id) AS rn FROM users) u
+    JOIN (SELECT product_id, ROW_NUMBER() OVER (ORDER BY product_id) AS rn FROM products) p
+        ON p.rn IN (u.rn, u.rn + 5000);
+    """,
+    "ANALYZE;",
+]
+
+
+class PlanRecordingCursor:
+    """Курсор, который перед выполнением каждого запроса сохраняет его план"""
+
+    def __init__(self, cursor, conn, plans: list):
+        self._cursor = cursor
+        self._conn = conn
+        self._plans = plans
+
+    def execute(self, query, params=None):
+        # Запросы, которые сами являются EXPLAIN (оценки количества), выполняются без проверки
+        if query.lstrip().upper().startswith("EXPLAIN"):
+            return self._cursor.execute(query, params)
+        with self._conn.cursor() as explain_cur:
+            explain_cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            self._plans.append((query, explain_cur.fetchone()[0][0]["Plan"]))
+        return self._cursor.execute(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+
+class PlanRecordingConnection:
+    """Общее соединение для всех функций; фиксация игнорируется, в конце все откатывается"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.plans = []
+
+    def cursor(self, *args, **kwargs):
+        return PlanRecordingCursor(self._conn.cursor(*args, **kwargs), self._conn, self.plans)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class PlanRecordingAsyncConnection:
+    """
+    Интерфейс соединения asyncpg поверх PlanRecordingConnection:
+    параметры $1, $2 ... переводятся в формат psycopg2, запрос выполняется синхронно
+    """
+
+    def __init__(self, recording: PlanRecordingConnection):
+        self._recording = recording
+
+    def _execute(self, query, args):
+        query = re.sub(r"\$(\d+)", r"%(p\1)s", query)
+        params = {f"p{i}": value for i, value in enumerate(args, start=1)}
+        cur = self._recording.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(query, params)
+        return cur
+
+    async def fetch(self, query, *args):
+        with self._execute(query, args) as cur:
+            return cur.fetchall()
+
+    async def fetchrow(self, query, *args):
+        with self._execute(query, args) as cur:
+            return cur.fetchone()
+
+    async def fetchval(self, query, *args):
+        with self._execute(query, args) as cur:
+            row = cur.fetchone()
+            return next(iter(row.values())) if row else None
+
+    async def execute(self, query, *args):
+        with self._execute(query, args):
+            pass
+
+
+# Запросы внутри серверной функции checkout_cart (migrations/functions.sql). EXPLAIN вызова функции
+# показывает только Function Scan, поэтому ее запросы проверяются отдельно; переменные PL/pgSQL
+# заменены параметрами. INSERT INTO orders ... VALUES таблиц не читает и не проверяется.
+# При изменении функции обновите и этот список.
+CHECKOUT_CART_STATEMENTS = [
+    """
+    UPDATE carts c
+    SET quantity = o.quantity
+    FROM unnest(%(product_ids)s::int[], %(quantities)s::int[]) AS o(product_id, quantity)
+    WHERE c.user_id = %(user_id)s AND c.product_id = o.product_id AND o.quantity > 0;
+    """,
+    """
+    DELETE FROM carts c
+    USING unnest(%(product_ids)s::int[], %(quantities)s::int[]) AS o(product_id, quantity)
+    WHERE c.user_id = %(user_id)s AND c.product_id = o.product_id AND o.quantity <= 0;
+    """,
+    """
+    SELECT COUNT(*), COALESCE(SUM(p.price * c.quantity), 0)
+    FROM (
+        SELECT product_id, SUM(quantity) AS quantity
+        FROM carts
+        WHERE user_id = %(user_id)s
+        GROUP BY product_id
+    ) c
+    JOIN products p ON p.product_id = c.product_id;
+    """,
+    """
+    UPDATE users
+    SET balance = balance - %(total)s
+    WHERE user_id = %(user_id)s AND balance >= %(total)s
+    RETURNING balance;
+    """,
+    """
+    SELECT 1
+    FROM products
+    WHERE product_id IN (SELECT product_id FROM carts WHERE user_id = %(user_id)s)
+    ORDER BY product_id
+    FOR UPDATE;
+    """,
+    """
+    UPDATE products p
+    SET stock_quantity = p.stock_quantity - c.quantity
+    FROM (
+        SELECT product_id, SUM(quantity) AS quantity
+        FROM carts
+        WHERE user_id = %(user_id)s
+        GROUP BY product_id
+    ) c
+    WHERE p.product_id = c.product_id AND p.stock_quantity >= c.quantity;
+    """,
+    """
+    INSERT INTO order_items (order_id, product_id, quantity)
+    SELECT %(order_id)s, product_id, SUM(quantity)
+    FROM carts
+    WHERE user_id = %(user_id)s
+    GROUP BY product_id;
+    """,
+    """
+    SELECT array_agg(DISTINCT product_id ORDER BY product_id)
+    FROM carts
+    WHERE user_id = %(user_id)s;
+    """,
+    "DELETE FROM carts WHERE user_id = %(user_id)s;",
+]
+
+
+def run_checkout_cart_statements(recording: "PlanRecordingConnection", params: dict) -> None:
+    with recording.cursor() as cur:
+        for query in CHECKOUT_CART_STATEMENTS:
+            cur.execute(query, params)
+
+
+def find_seq_scans(plan: dict) -> set:
+    """Таблицы, которые план читает через Seq Scan"""
+    relations = set()
+    if plan.get("Node Type") == "Seq Scan":
+        relations.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        relations |= find_seq_scans(child)
+    return relations
+
+
+def seed(conn) -> dict:
+    with conn.cursor() as cur:
+        for query in SEED_QUERIES:
+            cur.execute(query)
+        cur.execute("SELECT user_id, email FROM users WHERE email = 'plan-check-1@example.com';")
+        user_id, email = cur.fetchone()
+        cur.execute("SELECT product_id FROM products WHERE name LIKE 'Plan check product %%' ORDER BY product_id LIMIT 10;")
+        product_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT MAX(order_id) FROM orders;")
+        order_id = cur.fetchone()[0]
+        cur.execute("SELECT manufacturer_id FROM products WHERE product_id = %s;", (product_ids[0],))
+        manufacturer_id = cur.fetchone()[0]
+    return {"user_id": user_id, "email": email, "product_ids": product_ids, "order_id": order_id,
+            "manufacturer_id": manufacturer_id}
+
+
+def build_cases(ids: dict, recording: "PlanRecordingConnection") -> list:
+    """
+    Список проверок: (имя, вызов, таблицы, полный проход по которым допустим).
+    При добавлении запроса в repositories/ или services/orders.py добавьте его сюда.
+    """
+    user_id = ids["user_id"]
+    email = ids["email"]
+    product_id = ids["product_ids"][0]
+    product_ids = ids["product_ids"]
+    order_id = ids["order_id"]
+
+    return [
+        # repositories/products.py
+        ("products.get_products_names_id", lambda: repositories.products.get_products_names_id(), {"products"}),
+        ("products.get_product_details_by_id", lambda: repositories.products.get_product_details_by_id(product_id), set()),
+        ("products.get_product_details_by_ids", lambda: repositories.products.get_product_details_by_ids(product_ids), set()),
+        ("products.add_product_to_cart", lambda: repositories.products.add_product_to_cart(user_id, product_id, 1), set()),
+        ("products.decrease_product_stock", lambda: repositories.products.decrease_product_stock(product_id, 1), set()),
+        ("products.peek_products_stock", lambda: repositories.products.peek_products_stock(product_id), set()),
+        ("products.search_products_by_name", lambda: repositories.products.search_products_by_name("plan chek product 42", 10, 0.3), set()),
+        ("products.filter_products(price)", lambda: repositories.products.filter_products(
+            min_price=100, max_price=110, limit=20), set()),
+        ("products.filter_products(manufacturer)", lambda: repositories.products.filter_products(
+            manufacturer_id=ids["manufacturer_id"], max_price=50, limit=20), set()),
+        ("products.get_products_stock(all)", lambda: repositories.products.get_products_stock(), {"products"}),
+        ("products.get_products_stock(ids)", lambda: repositories.products.get_products_stock(product_ids), set()),
+        ("products.get_low_stock_products", lambda: repositories.products.get_low_stock_products(5), set()),
+        ("products.add_new_product", lambda: repositories.products.add_new_product("Plan check new", 1.0, "", 1, None, 1), set()),
+        # repositories/cart.py
+        ("cart.get_user_cart", lambda: repositories.cart.get_user_cart(user_id), set()),
+        ("cart.update_cart_item_quantity", lambda: repositories.cart.update_cart_item_quantity(user_id, product_id, 2), set()),
+        ("cart.update_cart_item_quantity(0)", lambda: repositories.cart.update_cart_item_quantity(user_id, product_id, 0), set()),
+        ("cart.checkout_cart", lambda: repositories.cart.checkout_cart(user_id), set()),
+        ("cart.checkout_cart(statements)", lambda: run_checkout_cart_statements(recording, {
+            "user_id": user_id, "product_ids": [product_id], "quantities": [2],
+            "total": 1.0, "order_id": order_id}), set()),
+        ("cart.clear_user_cart", lambda: repositories.cart.clear_user_cart(user_id), set()),
+        # repositories/users.py
+        ("users.get_users", lambda: repositories.users.get_users(), {"users"}),
+        ("users.get_user_by_email", lambda: repositories.users.get_user_by_email(email), set()),
+        ("users.get_user_balance_by_email", lambda: repositories.users.get_user_balance_by_email(email), set()),
+        ("users.set_user_balance_by_email", lambda: repositories.users.set_user_balance_by_email(email, 10.0), set()),
+        # repositories/admin.py
+        ("admin.get_admins", lambda: repositories.admin.get_admins(user_id), set()),
+        # repositories/async_users.py
+        ("async_users.get_user_by_email", lambda: asyncio.run(repositories.async_users.get_user_by_email(email)), set()),
+        ("async_users.email_exists", lambda: asyncio.run(repositories.async_users.email_exists(email)), set()),
+        ("async_users.get_password_hash_by_email", lambda: asyncio.run(
+            repositories.async_users.get_password_hash_by_email(email)), set()),
+        ("async_users.is_admin", lambda: asyncio.run(repositories.async_users.is_admin(user_id)), set()),
+        ("async_users.registration", lambda: asyncio.run(
+            repositories.async_users.registration("plan-check-new@example.com", "plan-check")), set()),
+        ("async_users.registration(duplicate)", lambda: asyncio.run(
+            repositories.async_users.registration(email, "plan-check")), set()),
+        # services/orders.py
+        ("orders.get_all_orders", lambda: services.orders.get_all_orders(), {"orders", "users"}),
+        ("orders.update_order_status", lambda: services.orders.update_order_status(order_id, "Shipped"), set()),
+        ("orders.get_user_orders", lambda: services.orders.get_user_orders(user_id), set()),
+        ("orders.get_orders_page", lambda: services.orders.get_orders_page(20), set()),
+        ("orders.get_orders_page(after)", lambda: services.orders.get_orders_page(
+            20, services.orders.get_orders_page(20)[1]), set()),
+        ("orders.get_orders_page(status)", lambda: services.orders.get_orders_page(20, status="Shipped"), set()),
+        ("orders.get_orders_page(user)", lambda: services.orders.get_orders_page(20, user_id=user_id), set()),
+        ("orders.create_order", lambda: services.orders.create_order(user_id, 0), set()),
+    ]
+
+
+def main() -> int:
+    conn = psycopg2.connect(**DB_CONFIG)
+    recording = PlanRecordingConnection(conn)
+
+    @contextmanager
+    def get_connection():
+        yield recording
+
+    @asynccontextmanager
+    async def get_async_connection():
+        yield PlanRecordingAsyncConnection(recording)
+
+    for module in PATCHED_MODULES:
+        module.get_connection = get_connection
+    for module in ASYNC_PATCHED_MODULES:
+        module.get_async_connection = get_async_connection
+
+    failures = []
+    try:
+        ids = seed(conn)
+        for name, call, allowed in build_cases(ids, recording):
+            recording.plans.clear()
+            with conn.cursor() as cur:
+                cur.execute("SAVEPOINT plan_check;")
+            case_failures = []
+            try:
+                call()
+                savepoint_command = "RELEASE SAVEPOINT plan_check;"
+            except Exception as e:
+                # Запросы после ошибки не выполнились и не проверены, поэтому проверка не пройдена
+                case_failures.append(f"{name}: call failed ({e})")
+                savepoint_command = "ROLLBACK TO SAVEPOINT plan_check;"
+            with conn.cursor() as cur:
+                cur.execute(savepoint_command)
+
+            if not recording.plans:
+                case_failures.append(f"{name}: no queries captured")
+            for query, plan in recording.plans:
+                seq_scans = (find_seq_scans(plan) & HOT_RELATIONS) - allowed
+                if seq_scans:
+                    case_failures.append(f"{name}: Seq Scan on {', '.join(sorted(seq_scans))}\n{query.strip()}")
+            print(f"[{'FAIL' if case_failures else ' OK '}] {name}")
+            failures.extend(case_failures)
+    finally:
+        conn.rollback()
+        # ANALYZE обновляет статистику в pg_class вне транзакции, поэтому пересчитываем ее
+        # после отката, чтобы планировщик не видел засеянные строки
+        with conn.cursor() as cur:
+            cur.execute(f"ANALYZE {', '.join(sorted(HOT_RELATIONS))};")
+        conn.commit()
+        conn.close()
+
+    if failures:
+        print("\nQuery plan regressions:")
+        for failure in failures:
+            print(f"- {failure}\n")
+        return 1
+    print("\nAll hot queries use indexes.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
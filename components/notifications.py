@@ -1,16 +1,17 @@
 import streamlit as st
-import json
-import threading
 import time
-from services.redis_service import RedisService
+from services.events import get_event_dispatcher
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Как часто (в секундах) фрагмент уведомлений забирает события из очереди сессии
+NOTIFICATION_REFRESH_INTERVAL = 1
+
 class NotificationHandler:
     def __init__(self):
-        self.redis_service = RedisService()
-        self.last_check_time = time.time()
+        # Очередь сессии в общем для процесса диспетчере событий
+        self.subscription = get_event_dispatcher().subscribe()
         self.status_mapping = {
             "Pending": "В обработке",
             "Processing": "В обработке",
@@ -23,29 +24,22 @@ class NotificationHandler:
     def check_notifications(self):
         """Check for new notifications"""
         try:
-            current_time = time.time()
-            # Проверяем сообщения только каждые 2 секунды
-            if current_time - self.last_check_time < 2:
-                return
+            # Пользователь сессии мог войти или выйти с момента создания подписки
+            self.subscription.user_id = st.session_state.get('user_id')
+            self.subscription.is_admin = bool(st.session_state.get('admin'))
 
-            self.last_check_time = current_time
-            message = self.redis_service.get_message()
-            
-            if message:
-                logger.info(f"Processing notification: {message}")
-                self._handle_notification(message)
+            for channel, message in self.subscription.get_events():
+                logger.info(f"Processing notification from {channel}: {message}")
+                self._handle_notification(channel, message)
         except Exception as e:
             logger.error(f"Error checking notifications: {e}")
 
-    def _handle_notification(self, message):
-        """Handle different types of notifications"""
+    def _handle_notification(self, channel, message):
+        """Handle notifications by the channel they were published to"""
         try:
-            if 'type' not in message:
-                return
-
-            if message['type'] == 'order_status_changed':
+            if channel == 'order_status_changed':
                 self._handle_order_status_change(message)
-            elif message['type'] == 'low_stock':
+            elif channel == 'admin_notifications' and message.get('type') == 'low_stock':
                 self._handle_low_stock_notification(message)
         except Exception as e:
             logger.error(f"Error handling notification: {e}")
@@ -61,9 +55,9 @@ class NotificationHandler:
                 logger.error("Missing required fields in order status notification")
                 return
 
-            # Проверяем, относится ли уведомление к текущему пользователю
-            current_user_id = st.session_state.get('user', {}).get('user_id')
-            if current_user_id and str(current_user_id) == str(user_id):
+            # Диспетчер уже отобрал события пользователя подписки; проверка на случай смены пользователя
+            current_user_id = self.subscription.user_id
+            if current_user_id is not None and str(current_user_id) == str(user_id):
                 # Преобразуем статус в русский
                 status_ru = self.status_mapping.get(status, status)
                 st.toast(f"Статус заказа #{order_id} изменен на: {status_ru}")
@@ -110,68 +104,16 @@ def add_notification(message: str, type: str = "info"):
     if len(st.session_state.notifications) > 5:
         st.session_state.notifications = st.session_state.notifications[-5:]
 
-def notification_listener():
-    """Listen for notifications from Redis PubSub"""
-    try:
-        logger.info("Starting notification listener...")
-        while True:
-            try:
-                message = redis_service.get_message()
-                if message:
-                    logger.debug(f"Received message: {message}")
-                    if message['type'] == 'message':
-                        try:
-                            data = json.loads(message['data'])
-                            logger.debug(f"Parsed message data: {data}")
-                            
-                            if data.get('type') == 'order_status_changed':
-                                # Преобразуем статус в русский
-                                status_mapping = {
-                                    "Pending": "В обработке",
-                                    "Processing": "В обработке",
-                                    "Confirmed": "Подтвержден",
-                                    "Shipped": "Отправлен",
-                                    "Delivered": "Доставлен",
-                                    "Cancelled": "Отменен"
-                                }
-                                status_ru = status_mapping.get(data['status'], data['status'])
-                                add_notification(
-                                    f"Статус заказа {data['order_id']} изменен на {status_ru}",
-                                    "success"
-                                )
-                                logger.info(f"Added order status notification: {data['order_id']}")
-                            elif data.get('type') == 'low_stock':
-                                notification_text = f"⚠️ Внимание! Товар '{data['product_name']}' заканчивается. Осталось: {data['current_stock']} шт."
-                                add_notification(notification_text, "warning")
-                                logger.info(f"Added low stock notification for product: {data['product_name']}")
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Failed to decode message: {e}")
-                            continue
-            except Exception as e:
-                logger.error(f"Error in notification loop: {e}")
-                time.sleep(1)  # Пауза перед следующей попыткой
-    except Exception as e:
-        logger.error(f"Fatal error in notification listener: {e}")
-        # Try to reconnect
-        try:
-            logger.info("Attempting to reconnect...")
-            redis_service.close_pubsub()
-            redis_service.pubsub = redis_service.redis_client.pubsub()
-            redis_service.pubsub.subscribe("order_status_changed", "admin_notifications")
-            logger.info("Successfully reconnected")
-        except Exception as reconnect_error:
-            logger.error(f"Failed to reconnect: {reconnect_error}")
-
 def start_notification_listener():
-    """Start notification listener in a separate thread"""
-    if "notification_thread" not in st.session_state:
-        logger.info("Starting new notification thread")
-        st.session_state.notification_thread = threading.Thread(
-            target=notification_listener,
-            daemon=True
-        )
-        st.session_state.notification_thread.start()
-        logger.info("Notification thread started")
+    """Start the process-wide notification listener (idempotent)"""
+    get_event_dispatcher().start()
+
+def _check_session_notifications():
+    st.session_state.notification_handler.check_notifications()
+
+# Во фрагменте очередь проверяется по таймеру без перезапуска всей страницы (streamlit >= 1.37)
+if hasattr(st, "fragment"):
+    _check_session_notifications = st.fragment(run_every=NOTIFICATION_REFRESH_INTERVAL)(_check_session_notifications)
 
 def show_notifications():
     """Show notifications in the UI"""
@@ -179,4 +121,4 @@ def show_notifications():
         st.session_state.notification_handler = NotificationHandler()
 
     # Проверяем новые уведомления
-    st.session_state.notification_handler.check_notifications() 
\ No newline at end of file
+    _check_session_notifications() 
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Хранение id сессии в cookie браузера.
+
+id сессии - предъявительский секрет: по нему восстанавливается вход вместе с токеном,
+поэтому в URL (история браузера, Referer, логи прокси, скопированные ссылки) его держать нельзя.
+Streamlit читает cookie запроса через streamlit.context.cookies, но не умеет их ставить,
+поэтому cookie записывается небольшим скриптом на странице (SameSite=Strict, Secure на https).
+"""
+import json
+
+import streamlit
+
+SESSION_COOKIE = "shop_session"
+
+
+def read_session_id() -> str:
+    """id сессии из cookie запроса, с которым открыта страница"""
+    return streamlit.context.cookies.get(SESSION_COOKIE)
+
+
+def _js_string(value: str) -> str:
+    # "</" внутри строки закрыл бы тег <script>
+    return json.dumps(value).replace("</", "<\\/")
+
+
+def _write_cookie(value: str, max_age: int) -> None:
+    streamlit.html(
+        f"""
+        <script>
+        {{
+            const secure = window.location.protocol === "https:" ? "; Secure" : "";
+            document.cookie = {_js_string(SESSION_COOKIE)} + "=" + {_js_string(value)}
+                + "; Max-Age={int(max_age)}; Path=/; SameSite=Strict" + secure;
+        }}
+        </script>
+        """,
+        unsafe_allow_javascript=True,
+    )
+
+
+def store_session_id(session_id: str, max_age: int) -> None:
+    """
+    Записать id сессии в cookie браузера
+    :param max_age: срок жизни cookie в секундах (как у сессии)
+    """
+    _write_cookie(session_id, max_age)
+
+
+def clear_session_id() -> None:
+    """Удалить cookie сессии (при выходе)"""
+    _write_cookie("", 0)
@@ -1,59 +1,76 @@
+import importlib
 import streamlit
-import pandas as pd
-from streamlit import session_state
 import requests
-import json
 import logging
 
-from services.auth import Authotize
-import services.users
-import services.regist
-import services.user
 import repositories.admin
-from pages.profile import show_profile_page
-from pages.store import show_store_page
-from pages.cart_page import show_cart_page
-from pages.admin import show_admin_page
-from services.redis_service import RedisService
-from components.notifications import init_notifications, start_notification_listener, show_notifications
+import settings
+from services.redis_service import get_redis_service
+from components.notifications import init_notifications, show_notifications
+from components.session_cookie import read_session_id, store_session_id, clear_session_id
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-auth = Authotize()
-users = services.users.get_users()
-registr = services.regist.Registration()
-redis_service = RedisService()
+redis_service = get_redis_service()
+SESSION_TTL = settings.JWT_CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
+
+# Страница -> (модуль, функция отрисовки). Модуль страницы и его сервисы импортируются
+# при первом показе страницы, а не при старте приложения
+PAGES = {
+    "Профиль": ("pages.profile", "show_profile_page"),
+    "Магазин": ("pages.store", "show_store_page"),
+    "Корзина": ("pages.cart_page", "show_cart_page"),
+    "Админ": ("pages.admin", "show_admin_page"),
+}
+
+
+def show_page(page: str) -> None:
+    module_name, function_name = PAGES[page]
+    getattr(importlib.import_module(module_name), function_name)()
+
+
+def load_user(email) -> bool:
+    """Загрузить пользователя и его права в session_state; pandas нужен только после входа"""
+    import services.user
+
+    user = services.user.get_user(email)
+    if user is None or user.empty:
+        return False
+    streamlit.session_state.user = user
+    streamlit.session_state["admin"] = repositories.admin.get_admins(user["user_id"].item())
+    return True
 
 def check_existing_session():
-    """Check if there's an existing valid session in Redis"""
+    """Restore the session whose id is kept in the session cookie"""
     try:
-        # Get all session keys from Redis
-        session_keys = redis_service.redis_client.keys("session:*")
-        
-        for session_key in session_keys:
-            # Fix: Handle both string and bytes session keys
-            session_id = session_key.decode('utf-8').split(':')[1] if isinstance(session_key, bytes) else session_key.split(':')[1]
-            session_data = redis_service.get_session(session_id)
-            
-            if session_data and session_data.get('is_active'):
-                # Found active session, restore it
-                streamlit.session_state["authenticated"] = True
-                streamlit.session_state["username"] = session_data.get('email')
-                streamlit.session_state["user_id"] = session_data.get('user_id')
-                
-                # Get token
-                token = redis_service.get_token(str(session_data.get('user_id')))
-                if token:
-                    streamlit.session_state["token"] = token
-                    
-                    # Get user data
-                    user = services.user.get_user(session_data.get('email'))
-                    if user is not None:
-                        streamlit.session_state.user = user
-                        streamlit.session_state["admin"] = repositories.admin.get_admins(streamlit.session_state.user["user_id"].item())
-                        return True
+        # Старые ссылки с id сессии в URL больше не восстанавливают вход
+        if "session" in streamlit.query_params:
+            del streamlit.query_params["session"]
+
+        session_id = read_session_id()
+        if not session_id:
+            return False
+
+        session_data = redis_service.get_session(session_id, ttl=SESSION_TTL)
+        if session_data and session_data.get('is_active'):
+            # Found active session, restore it
+            streamlit.session_state["authenticated"] = True
+            streamlit.session_state["username"] = session_data.get('email')
+            streamlit.session_state["user_id"] = session_data.get('user_id')
+            streamlit.session_state["session_id"] = session_id
+
+            # Get token
+            token = redis_service.get_token(str(session_data.get('user_id')))
+            if token:
+                streamlit.session_state["token"] = token
+
+                # Get user data
+                if load_user(session_data.get('email')):
+                    return True
+        # Сессия истекла или завершена: cookie больше не нужна
+        clear_session_id()
     except Exception as e:
         streamlit.error(f"Ошибка при проверке сессии: {str(e)}")
     return False
@@ -78,6 +95,7 @@ def login():
                 streamlit.session_state["username"] = email
                 streamlit.session_state["token"] = data["access_token"]
                 streamlit.session_state["user_id"] = data["user_id"]
+                streamlit.session_state["session_id"] = data["session_id"]
                 
                 # Получаем сессионные данные
                 session_response = requests.get(
@@ -100,9 +118,7 @@ def login():
                 streamlit.success(f"Добро пожаловать, {email}!")
                 
                 # Получаем данные пользователя
-                user = services.user.get_user(email)
-                streamlit.session_state.user = user
-                streamlit.session_state["admin"] = repositories.admin.get_admins(streamlit.session_state.user["user_id"].item())
+                load_user(email)
                 streamlit.rerun()
             else:
                 streamlit.error("Неверная почта или пароль!")
@@ -122,7 +138,7 @@ def logout():
                 if "user_id" in streamlit.session_state:
                     redis_service.cleanup_user_sessions(str(streamlit.session_state["user_id"]))
                 
-                # Очищаем все данные сессии
+                # Очищаем все данные сессии; cookie удаляется при следующей проверке сессии
                 for key in list(streamlit.session_state.keys()):
                     del streamlit.session_state[key]
                 streamlit.session_state["authenticated"] = False
@@ -159,10 +175,11 @@ def register():
                         streamlit.session_state["authenticated"] = True
                         streamlit.session_state["username"] = email
                         streamlit.session_state["token"] = data["access_token"]
+                        streamlit.session_state["user_id"] = data["user_id"]
+                        streamlit.session_state["session_id"] = data["session_id"]
                         
                         # Получаем данные пользователя
-                        user = services.user.get_user(email)
-                        streamlit.session_state.user = user
+                        load_user(email)
                         streamlit.rerun()
                     else:
                         error_data = response.json()
@@ -187,6 +204,10 @@ def main():
                 elif pg == "Регистрация":
                     register()
         else:
+            # cookie сессии позволяет восстановить вход после перезагрузки страницы
+            if streamlit.session_state.get("session_id") and read_session_id() != streamlit.session_state["session_id"]:
+                store_session_id(streamlit.session_state["session_id"], SESSION_TTL)
+
             # Показываем уведомления
             show_notifications()
             
@@ -200,28 +221,13 @@ def main():
                     "Перейти к странице",
                     ["Профиль", "Магазин", "Корзина", "Админ"],
                 )
-
-                if page == "Профиль":
-                    show_profile_page()
-                if page == "Магазин":
-                    show_store_page()
-                if page == "Корзина":
-                    show_cart_page()
-                if page == "Админ":
-                    show_admin_page()
-
             else:
                 page = streamlit.sidebar.radio(
                     "Перейти к странице",
                     ["Профиль", "Магазин", "Корзина"],
                 )
 
-                if page == "Профиль":
-                    show_profile_page()
-                if page == "Магазин":
-                    show_store_page()
-                if page == "Корзина":
-                    show_cart_page()
+            show_page(page)
     except Exception as e:
         logger.error(f"Unexpected error in main: {e}")
         streamlit.error("Произошла непредвиденная ошибка. Пожалуйста, попробуйте позже.")
@@ -233,9 +239,8 @@ if "admin" not in streamlit.session_state:
     streamlit.session_state["admin"] = False
 
 if "user" not in streamlit.session_state:
-    streamlit.session_state.user = pd.DataFrame(
-        columns = ["user_id", "email", "balance"]
-    )
+    # DataFrame пользователя появляется после входа (load_user)
+    streamlit.session_state.user = None
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,144 +1,114 @@
-from os import access
-
-import streamlit as st
-import pandas as pd
-from fastapi.openapi.models import OAuth2
-from streamlit import session_state
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-import bcrypt
-from sympy.codegen.ast import continue_
 from datetime import timedelta, datetime, timezone
-import requests
 import logging
+import secrets
 
-from passw import hash_password, verify_password
-import services.users
-import services.user
-import services.regist
+import repositories.async_users
 import settings
 from services.auth import Authotize
-from services.redis_service import RedisService
+from services.async_redis_service import get_async_redis_service
+from repositories.async_connection import close_async_pool
+from services.events import get_event_broker
+from services.passwords import get_password_hasher, PasswordPoolBusy
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Закрываем пулы соединений и процессов при остановке сервера
+    await close_async_pool()
+    await async_redis_service.close()
+    password_hasher.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
-registr = services.regist.Registration()
 auth = Authotize()
-redis_service = RedisService()
-API_URL="http://127.0.0.1:8000"
+async_redis_service = get_async_redis_service()
+event_broker = get_event_broker()
+password_hasher = get_password_hasher()
 logger = logging.getLogger(__name__)
 
 
-@app.post("/register")
-def register_user(email: str, password: str):
-    # Проверяем кеш на наличие промежуточных результатов регистрации
-    registration_cache_key = f"registration:{email}"
-    logger.info(f"Проверка кеша регистрации для email: {email}")
-    cached_result = redis_service.get_intermediate_result(registration_cache_key)
-    if cached_result:
-        logger.info(f"Найдены кешированные данные регистрации для email: {email}")
-        return cached_result
-
-    logger.info(f"Начало процесса регистрации для email: {email}")
-    users = services.users.get_users()
-    if users["email"].isin([email]).any():
-        logger.warning(f"Попытка регистрации с существующим email: {email}")
-        raise HTTPException(status_code=400, detail="email already registered")
-    
-    user_id = registr.registr(pd.DataFrame({"email": [email], "password": [password]}))
-    logger.info(f"Пользователь {email} успешно зарегистрирован с ID: {user_id}")
-    
-    # Создаем токен для нового пользователя
+def _create_access_token(email: str, session_id: str) -> str:
     access_token_expires = timedelta(minutes=settings.JWT_CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"])
-    access_token = jwt.encode(
-        {"sub": email, "exp": datetime.now(timezone.utc) + access_token_expires},
+    return jwt.encode(
+        {"sub": email, "sid": session_id, "exp": datetime.now(timezone.utc) + access_token_expires},
         settings.JWT_CONFIG["SECRET_KEY"],
         algorithm=settings.JWT_CONFIG["ALGORITHM"]
     )
-    logger.info(f"Создан токен для пользователя {email}")
-    
-    # Store token in Redis
-    redis_service.store_token(
-        str(user_id),
-        access_token,
-        settings.JWT_CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
-    )
-    logger.info(f"Токен сохранен в Redis для пользователя {email}")
-    
+
+
+async def _start_session(user_id: str, email: str) -> dict:
+    """Создает токен и сессию пользователя в Redis"""
+    session_id = secrets.token_urlsafe(32)
+    access_token = _create_access_token(email, session_id)
+    ttl = settings.JWT_CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
+
+    # Сохраняем токен
+    await async_redis_service.store_token(user_id, access_token, ttl)
+
     # Сохраняем сессионные данные
     session_data = {
-        "user_id": str(user_id),
+        "user_id": user_id,
         "email": email,
         "last_login": datetime.now(timezone.utc).isoformat(),
         "is_active": True
     }
-    redis_service.store_session(
-        str(user_id),
-        session_data,
-        settings.JWT_CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
-    )
-    logger.info(f"Сессионные данные сохранены для пользователя {email}")
-    
-    result = {
-        "message": "Registration is successful",
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user_id": str(user_id)
-    }
-    
-    # Кешируем промежуточный результат регистрации
-    logger.info(f"Кеширование промежуточных результатов регистрации для {email}")
-    redis_service.cache_intermediate_result(registration_cache_key, result)
-    logger.info(f"Промежуточные результаты регистрации успешно закешированы для {email}")
-    
-    return result
+    await async_redis_service.store_session(session_id, session_data, ttl)
+    return {"access_token": access_token, "token_type": "bearer", "user_id": user_id, "session_id": session_id}
+
+
+@app.post("/register")
+async def register_user(email: str, password: str):
+    logger.info(f"Начало процесса регистрации для email: {email}")
+    # Быстрая проверка до bcrypt; окончательно дубликат отсекает ON CONFLICT при вставке
+    if await repositories.async_users.email_exists(email):
+        logger.warning(f"Попытка регистрации с существующим email: {email}")
+        raise HTTPException(status_code=400, detail="email already registered")
+
+    # bcrypt выполняется в пуле процессов и не занимает цикл событий
+    password_hash = await password_hasher.hash(password)
+    user_id = await repositories.async_users.registration(email, password_hash)
+    if user_id is None:
+        # Email заняли параллельной регистрацией между проверкой и вставкой
+        logger.warning(f"Попытка регистрации с существующим email: {email}")
+        raise HTTPException(status_code=400, detail="email already registered")
+    logger.info(f"Пользователь {email} успешно зарегистрирован с ID: {user_id}")
+    # Email мог быть закеширован как отсутствующий при попытке входа до регистрации
+    auth.forget(email)
+
+    # Создаем токен и сессию для нового пользователя
+    return {"message": "Registration is successful", **await _start_session(str(user_id), email)}
 
 
 @app.post("/token")
-def login_api(email: str, password: str):
-    if auth.auth(email, password):
-        access_token_expires = timedelta(minutes=settings.JWT_CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"])
-        access_token = jwt.encode(
-            {"sub": email, "exp": datetime.now(timezone.utc) + access_token_expires},
-            settings.JWT_CONFIG["SECRET_KEY"],
-            algorithm=settings.JWT_CONFIG["ALGORITHM"]
-        )
-        
-        # Store token in Redis
-        user = services.user.get_user(email)
-        user_id = str(user["user_id"].item())
-        
-        # Сохраняем токен
-        redis_service.store_token(
-            user_id,
-            access_token,
-            settings.JWT_CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
-        )
-        
-        # Сохраняем сессионные данные
-        session_data = {
-            "user_id": user_id,
-            "email": email,
-            "last_login": datetime.now(timezone.utc).isoformat(),
-            "is_active": True
-        }
-        redis_service.store_session(
-            user_id,
-            session_data,
-            settings.JWT_CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
-        )
-        
-        return {
-            "message": "Successful authorization",
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user_id": user_id
-        }
+async def login_api(email: str, password: str):
+    if await auth.auth_async(email, password, password_hasher):
+        user = await repositories.async_users.get_user_by_email(email)
+        if user is None:
+            raise HTTPException(status_code=400, detail="Wrong email or password")
+        return {"message": "Successful authorization", **await _start_session(str(user["user_id"]), email)}
     else:
         raise HTTPException(status_code=400, detail="Wrong email or password")
 
+
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy_handler(request: Request, exc: PasswordPoolBusy):
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Server is busy, try again later"},
+                        headers={"Retry-After": "1"})
+
+
+@app.get("/metrics/password-pool")
+async def password_pool_metrics():
+    """Загрузка пула bcrypt: задачи в работе, глубина очереди, отклоненные запросы"""
+    return password_hasher.stats()
+
 async def get_current_user(token: str= Depends(oauth2_scheme)):
     credentials_exception = HTTPException(status_code= 401, detail="Invalid token")
     try:
@@ -146,100 +116,82 @@ async def get_current_user(token: str= Depends(oauth2_scheme)):
         email = payload.get("sub")
         if email is None:
             raise credentials_exception
-            
-        # Verify token in Redis
-        user = services.user.get_user(email)
-        stored_token = redis_service.get_token(str(user["user_id"].item()))
-        if not stored_token or stored_token != token:
-            raise credentials_exception
-            
     except JWTError:
         raise credentials_exception
 
-    user = services.user.get_user(email)
+    user = await repositories.async_users.get_user_by_email(email)
     if user is None:
         raise credentials_exception
-    return user.to_dict(orient="records")[0]
+
+    # Verify token in Redis
+    stored_token = await async_redis_service.get_token(str(user["user_id"]))
+    if not stored_token or stored_token != token:
+        raise credentials_exception
+    return user
+
+def get_session_id(token: str = Depends(oauth2_scheme)) -> str:
+    """ID сессии из claim sid токена"""
+    credentials_exception = HTTPException(status_code=401, detail="Invalid token")
+    try:
+        payload = jwt.decode(token, settings.JWT_CONFIG["SECRET_KEY"], algorithms=settings.JWT_CONFIG["ALGORITHM"])
+    except JWTError:
+        raise credentials_exception
+    session_id = payload.get("sid")
+    if session_id is None:
+        raise credentials_exception
+    return session_id
 
 @app.get("/profile")
-def get_profile(user: dict = Depends(get_current_user)):
+async def get_profile(user: dict = Depends(get_current_user)):
     # Cache user profile data
-    cached_profile = redis_service.get_cached_data(f"profile:{user['user_id']}")
+    cached_profile = await async_redis_service.get_cached_data(f"profile:{user['user_id']}")
     if cached_profile:
         return cached_profile
         
     profile_data = user
-    redis_service.cache_data(f"profile:{user['user_id']}", profile_data)
+    await async_redis_service.cache_data(f"profile:{user['user_id']}", profile_data)
     return profile_data
 
 @app.get("/session")
-async def get_session_data(user: dict = Depends(get_current_user)):
+async def get_session_data(user: dict = Depends(get_current_user), session_id: str = Depends(get_session_id)):
     """Get session data for current user"""
     try:
-        session_data = redis_service.get_session(str(user["user_id"]))
-        if not session_data:
+        session_data = await async_redis_service.get_session(
+            session_id,
+            ttl=settings.JWT_CONFIG["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60
+        )
+        if not session_data or str(session_data.get("user_id")) != str(user["user_id"]):
             raise HTTPException(status_code=404, detail="Session not found")
         return session_data
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/logout")
-async def logout(user: dict = Depends(get_current_user)):
+async def logout(user: dict = Depends(get_current_user), session_id: str = Depends(get_session_id)):
     """Logout user and clear session"""
     try:
         user_id = str(user["user_id"])
         # Удаляем токен
-        redis_service.delete_token(user_id)
+        await async_redis_service.delete_token(user_id)
         # Удаляем сессию
-        redis_service.redis_client.delete(f"session:{user_id}")
+        await async_redis_service.delete_session(session_id)
         return {"message": "Successfully logged out"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def login_page():
-    st.title("Авторизация")
-    st.write("Введите почту и пароль")
-    email = st.text_input("Почта")
-    password = st.text_input("Пароль", type = "password")
-
-    if st.button("Войти"):
-        response = requests.post(f"{API_URL}/token", params={"email": email, "password": password})
-        if response.status_code == 200:
-            data = response.json()
-            st.session_state["token"] = data["access_token"]
-            st.session_state["authenticated"] = True
-            
-            # Store session in Redis
-            redis_service.store_session(
-                st.session_state["token"],
-                {"email": email, "authenticated": True}
-            )
-            
-            st.success("Вы успешно вошли!")
-        else:
-            st.error("Неверный email или пароль")
-
-
-
-def profile():
-    st.title("Профиль")
-
-    if "token" not in st.session_state:
-        st.error("Сначала войдите в систему")
-        return
-
-    # Check session in Redis
-    session_data = redis_service.get_session(st.session_state["token"])
-    if not session_data:
-        st.error("Сессия истекла. Пожалуйста, войдите снова.")
-        st.session_state["authenticated"] = False
-        return
-
-    headers = {"Authorization": f"Bearer {st.session_state['token']}"}
-    response = requests.get(f"{API_URL}/profile", headers=headers)
-
-    if response.status_code == 200:
-        user = response.json()
-        st.write(f"Ваш email: {user['email']}")
-    else:
-        st.error("Ошибка при получении профиля")
\ No newline at end of file
+@app.get("/events")
+async def stream_events(request: Request, user: dict = Depends(get_current_user)):
+    """
+    Server-Sent Events: order_status_changed и new_notification текущего пользователя,
+    admin_notifications - если пользователь администратор. Простаивающее соединение
+    получает heartbeat-комментарий раз в SSE_HEARTBEAT_INTERVAL секунд.
+    """
+    is_admin = await repositories.async_users.is_admin(user["user_id"])
+    subscription = await event_broker.subscribe(user["user_id"], is_admin)
+    return StreamingResponse(
+        event_broker.stream(subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -45,6 +45,14 @@ CREATE TABLE orders (
     status VARCHAR(50) NOT NULL -- Статус заказа
 );
 
+-- Таблица позиций заказа (order_items)
+CREATE TABLE order_items (
+    order_item_id SERIAL PRIMARY KEY,
+    order_id INT NOT NULL REFERENCES orders(order_id) ON DELETE CASCADE,
+    product_id INT REFERENCES products(product_id) ON DELETE SET NULL,
+    quantity INT NOT NULL CHECK (quantity > 0) -- Количество товара в заказе
+);
+
 -- Таблица отзывов (reviews)
 CREATE TABLE reviews (
     review_id SERIAL PRIMARY KEY,
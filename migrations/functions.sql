@@ -0,0 +1,99 @@
+-- Оформление заказа одной транзакцией на стороне сервера.
+-- Применяет изменения количества из корзины, списывает баланс, уменьшает остатки
+-- одним UPDATE, создает заказ с позициями и очищает корзину.
+-- При нехватке средств или товара выбрасывает исключение, и вся транзакция откатывается.
+-- Возвращает также ID купленных товаров, чтобы приложение сбросило их кеш.
+-- Тип результата менялся, поэтому старую версию функции нужно удалить (CREATE OR REPLACE этого не умеет).
+DROP FUNCTION IF EXISTS checkout_cart(INT, INT[], INT[]);
+CREATE FUNCTION checkout_cart(
+    p_user_id INT,
+    p_product_ids INT[] DEFAULT '{}',
+    p_quantities INT[] DEFAULT '{}'
+)
+RETURNS TABLE (new_order_id INT, order_total FLOAT, remaining_balance FLOAT, purchased_product_ids INT[])
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_order_id INT;
+    v_total FLOAT;
+    v_items INT;
+    v_updated INT;
+    v_balance FLOAT;
+    v_product_ids INT[];
+BEGIN
+    -- Изменения количества, сделанные на странице корзины (0 - удалить товар)
+    UPDATE carts c
+    SET quantity = o.quantity
+    FROM unnest(p_product_ids, p_quantities) AS o(product_id, quantity)
+    WHERE c.user_id = p_user_id AND c.product_id = o.product_id AND o.quantity > 0;
+
+    DELETE FROM carts c
+    USING unnest(p_product_ids, p_quantities) AS o(product_id, quantity)
+    WHERE c.user_id = p_user_id AND c.product_id = o.product_id AND o.quantity <= 0;
+
+    SELECT COUNT(*), COALESCE(SUM(p.price * c.quantity), 0)
+    INTO v_items, v_total
+    FROM (
+        SELECT product_id, SUM(quantity) AS quantity
+        FROM carts
+        WHERE user_id = p_user_id
+        GROUP BY product_id
+    ) c
+    JOIN products p ON p.product_id = c.product_id;
+
+    IF v_items = 0 THEN
+        RAISE EXCEPTION 'Cart is empty. Cannot create an order.';
+    END IF;
+
+    -- Списание баланса: условный UPDATE вместо чтения и записи нового значения
+    UPDATE users
+    SET balance = balance - v_total
+    WHERE user_id = p_user_id AND balance >= v_total
+    RETURNING balance INTO v_balance;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Insufficient balance';
+    END IF;
+
+    -- Блокируем строки товаров в одном порядке, чтобы параллельные заказы не попадали в deadlock
+    PERFORM 1
+    FROM products
+    WHERE product_id IN (SELECT product_id FROM carts WHERE user_id = p_user_id)
+    ORDER BY product_id
+    FOR UPDATE;
+
+    UPDATE products p
+    SET stock_quantity = p.stock_quantity - c.quantity
+    FROM (
+        SELECT product_id, SUM(quantity) AS quantity
+        FROM carts
+        WHERE user_id = p_user_id
+        GROUP BY product_id
+    ) c
+    WHERE p.product_id = c.product_id AND p.stock_quantity >= c.quantity;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    IF v_updated <> v_items THEN
+        RAISE EXCEPTION 'Not enough stock to fulfill the request';
+    END IF;
+
+    INSERT INTO orders (user_id, order_date, status)
+    VALUES (p_user_id, NOW(), 'Pending')
+    RETURNING order_id INTO v_order_id;
+
+    INSERT INTO order_items (order_id, product_id, quantity)
+    SELECT v_order_id, product_id, SUM(quantity)
+    FROM carts
+    WHERE user_id = p_user_id
+    GROUP BY product_id;
+
+    SELECT array_agg(DISTINCT product_id ORDER BY product_id)
+    INTO v_product_ids
+    FROM carts
+    WHERE user_id = p_user_id;
+
+    DELETE FROM carts WHERE user_id = p_user_id;
+
+    RETURN QUERY SELECT v_order_id, v_total, v_balance, v_product_ids;
+END;
+$$;
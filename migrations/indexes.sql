@@ -0,0 +1,46 @@
+-- Индексы для горячих запросов.
+-- CONCURRENTLY позволяет применить миграцию к работающей базе без блокировки записи
+-- (файл выполняется через psql, каждая команда в отдельной транзакции).
+
+-- Корзина пользователя: поиск по user_id и проверка товара в корзине (user_id, product_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carts_user_product
+    ON carts (user_id, product_id) INCLUDE (quantity);
+
+-- Заказы пользователя, отсортированные по дате
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_user_date
+    ON orders (user_id, order_date DESC);
+
+-- Все заказы, отсортированные по дате (панель администратора).
+-- Ключ (order_date, order_id) используется для постраничного вывода заказов
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_date_id
+    ON orders (order_date DESC, order_id DESC);
+DROP INDEX CONCURRENTLY IF EXISTS idx_orders_date;
+
+-- Заказы с фильтром по статусу в панели администратора
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_orders_status_date_id
+    ON orders (status, order_date DESC, order_id DESC);
+
+-- Отзывы о товаре
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_product
+    ON reviews (product_id);
+
+-- Позиции заказа
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_items_order
+    ON order_items (order_id);
+
+-- Поиск товаров с низким остатком
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_stock
+    ON products (stock_quantity);
+
+-- Фильтрация товаров по диапазону цен с сортировкой по цене
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_price_id
+    ON products (price, product_id);
+
+-- Фильтрация товаров по производителю (и цене внутри производителя)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_manufacturer_price_id
+    ON products (manufacturer_id, price, product_id);
+
+-- Нечеткий поиск товаров по названию (pg_trgm, оператор <% и word_similarity)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_name_trgm
+    ON products USING gin (name gin_trgm_ops);
@@ -6,25 +6,26 @@ import services.user
 import services.products
 import services.cart
 import services.orders
-from services.redis_service import RedisService
-from services.order_status import STATUS_MAPPING, REVERSE_STATUS_MAPPING
+from services.redis_service import get_redis_service
+from services.order_status import STATUS_MAPPING, REVERSE_STATUS_MAPPING, ALL_STATUSES
 
 # Инициализация Redis сервиса
-redis_service = RedisService()
+redis_service = get_redis_service()
+
+# Количество заказов на одной странице панели администратора
+ORDERS_PAGE_SIZE = 20
 
 def check_low_stock_products():
     """Check for products with low stock and notify admin"""
     try:
-        products_df = services.products.fetch_product_names_and_ids()
-        if not products_df.empty:
-            for _, product in products_df.iterrows():
-                stock = services.products.check_product_stock(product['product_id'])
-                if stock <= 5:  # Порог низкого количества
-                    redis_service.notify_admin_low_stock(
-                        product['product_id'],
-                        product['name'],
-                        stock
-                    )
+        low_stock_df = services.products.fetch_low_stock_products(services.products.LOW_STOCK_THRESHOLD)
+        for product in low_stock_df.to_dict("records"):
+            redis_service.notify_admin_low_stock(
+                product['product_id'],
+                product['name'],
+                product['stock_quantity'],
+                services.products.LOW_STOCK_THRESHOLD
+            )
     except Exception as e:
         st.error(f"Ошибка при проверке количества товаров: {e}")
 
@@ -37,7 +38,30 @@ def show_admin_page():
     # Отображение всех заказов
     st.header("Управление заказами")
     try:
-        orders_df = services.orders.get_all_orders()
+        status_col, user_col = st.columns(2)
+        with status_col:
+            status_filter = st.selectbox(
+                "Статус",
+                [None] + ALL_STATUSES,
+                format_func=lambda status: "Все" if status is None else STATUS_MAPPING.get(status, status),
+                key="orders_status_filter"
+            )
+        with user_col:
+            user_filter = st.number_input("ID пользователя (0 - все)", min_value=0, step=1, key="orders_user_filter")
+        filters = (status_filter, int(user_filter) or None)
+
+        # Стек ключей страниц: последний элемент - ключ текущей страницы; при смене фильтров начинаем сначала
+        if st.session_state.get("orders_filters") != filters:
+            st.session_state["orders_filters"] = filters
+            st.session_state["orders_page_cursors"] = [None]
+        page_cursors = st.session_state["orders_page_cursors"]
+
+        orders_df, next_cursor = services.orders.get_orders_page(
+            ORDERS_PAGE_SIZE, page_cursors[-1], status=filters[0], user_id=filters[1]
+        )
+        total_estimate = services.orders.estimate_orders_count(status=filters[0], user_id=filters[1])
+        st.caption(f"Страница {len(page_cursors)} · заказов примерно: {total_estimate}")
+
         if not orders_df.empty:
             # Добавляем возможность изменения статуса заказа
             for index, order in orders_df.iterrows():
@@ -80,6 +104,14 @@ def show_admin_page():
                             st.error(f"Ошибка при обновлении статуса: {e}")
         else:
             st.write("Нет активных заказов")
+
+        prev_col, next_col = st.columns(2)
+        if prev_col.button("← Назад", disabled=len(page_cursors) == 1, key="orders_prev_page"):
+            page_cursors.pop()
+            st.rerun()
+        if next_col.button("Вперед →", disabled=next_cursor is None, key="orders_next_page"):
+            page_cursors.append(next_cursor)
+            st.rerun()
     except Exception as e:
         st.error(f"Ошибка при получении заказов: {e}")
 
@@ -88,9 +120,8 @@ def show_admin_page():
     try:
         products_df = services.products.fetch_product_names_and_ids()
         if not products_df.empty:
-            products_df['stock_quantity'] = products_df['product_id'].apply(
-                lambda pid: services.products.check_product_stock(pid)
-            )
+            stock_by_id = services.products.check_products_stock(products_df['product_id'].tolist())
+            products_df['stock_quantity'] = products_df['product_id'].map(stock_by_id)
         st.dataframe(products_df)
     except Exception as e:
         st.error(f"Ошибка при получении товаров: {e}")
@@ -130,7 +161,7 @@ def show_admin_page():
                 services.products.reduce_product_stock(product_id, current_stock - new_stock_quantity)
                 
                 # Проверяем, не стало ли количество низким после обновления
-                if new_stock_quantity <= 5:
+                if new_stock_quantity <= services.products.LOW_STOCK_THRESHOLD:
                     # Получаем информацию о товаре
                     product_info = services.products.fetch_product_names_and_ids()
                     product_name = product_info[product_info['product_id'] == product_id]['name'].iloc[0]
@@ -3,13 +3,7 @@ import streamlit as st
 import time
 
 import services.user
-import services.products
 import services.cart
-import services.orders
-from services.redis_service import RedisService
-
-# Инициализация Redis сервиса
-redis_service = RedisService()
 
 def show_cart_page():
     st.title("Корзина")
@@ -77,28 +71,10 @@ def show_cart_page():
             if st.button("Подтвердить заказ", disabled=confirm_disabled):
                 if user_balance >= total_price:
                     try:
-                        # Применяем изменения в корзине и вычитаем со склада
-                        for product_id, new_quantity in quantity_changes.items():
-                            services.cart.update_cart_item(user_id, product_id, new_quantity)
-                            services.products.reduce_product_stock(product_id, new_quantity)
-
-                        # Создаем новый заказ
-                        order_id = services.orders.create_order(user_id, 0)  # total_amount больше не используется
-                        
-                        # Отправляем уведомление о новом заказе
-                        redis_service.update_order_status(
-                            str(order_id),
-                            "В обработке",
-                            str(user_id)
-                        )
-
-                        # Очищаем корзину
-                        services.cart.clear_cart(user_id)
-
-                        # Обновляем баланс пользователя
-                        new_balance = user_balance - total_price
-                        services.user.set_user_balance(email, new_balance)
-                        st.session_state['user']['balance'] = new_balance
+                        # Изменения корзины, списание остатков и баланса, создание заказа
+                        # и очистка корзины выполняются одной транзакцией в БД
+                        checkout = services.cart.process_checkout(user_id, quantity_changes)
+                        st.session_state['user']['balance'] = checkout['balance']
 
                         st.success("Заказ успешно оформлен!")
                         time.sleep(1.5)
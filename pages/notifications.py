@@ -1,7 +1,10 @@
 import streamlit as st
-from services.notifications import get_user_notifications, mark_notification_as_read, get_unread_notifications_count
+from services.notifications import get_user_notifications, mark_notification_as_read, get_unread_notifications_count, \
+    mark_all_notifications_as_read
 import time
 
+NOTIFICATIONS_PAGE_SIZE = 10
+
 def show_notifications():
     st.title("Уведомления")
     
@@ -11,13 +14,22 @@ def show_notifications():
     
     user_id = st.session_state.user_id
     
+    # Курсоры страниц: ID последнего уведомления каждой предыдущей страницы
+    page_cursors = st.session_state.setdefault("notification_page_cursors", [])
+    before = page_cursors[-1] if page_cursors else None
+    
     # Получаем уведомления
-    notifications = get_user_notifications(user_id)
+    notifications = get_user_notifications(user_id, limit=NOTIFICATIONS_PAGE_SIZE, before=before)
     
-    if not notifications:
+    if not notifications and not page_cursors:
         st.info("У вас пока нет уведомлений")
         return
     
+    if get_unread_notifications_count(user_id) > 0:
+        if st.button("Отметить все как прочитанные"):
+            mark_all_notifications_as_read(user_id)
+            st.rerun()
+    
     # Отображаем уведомления
     for notification in notifications:
         with st.container():
@@ -42,6 +54,17 @@ def show_notifications():
                     if st.button("✓", key=f"read_{notification['id']}"):
                         mark_notification_as_read(user_id, notification["id"])
                         st.rerun()
+    
+    # Переход между страницами
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if page_cursors and st.button("← Новее"):
+            page_cursors.pop()
+            st.rerun()
+    with col_next:
+        if len(notifications) == NOTIFICATIONS_PAGE_SIZE and st.button("Старее →"):
+            page_cursors.append(notifications[-1]["id"])
+            st.rerun()
 
 def notification_bell():
     """Компонент колокольчика с количеством непрочитанных уведомлений"""
@@ -0,0 +1,58 @@
+"""
+Асинхронный пул соединений с PostgreSQL (asyncpg) для эндпоинтов FastAPI.
+
+Пул создается при первом обращении в цикле событий приложения и закрывается close_async_pool
+при его остановке. Запросы вне явной транзакции (conn.transaction()) фиксируются сразу.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import asyncpg
+from settings import (
+    DB_CONFIG,
+    POOL_MIN_CONN,
+    POOL_MAX_CONN,
+    ASYNC_POOL_MAX_IDLE_TIME,
+    POOL_ACQUIRE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_async_pool() -> asyncpg.Pool:
+    """Общий для процесса асинхронный пул соединений"""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    database=DB_CONFIG["dbname"],
+                    user=DB_CONFIG["user"],
+                    password=DB_CONFIG["password"],
+                    host=DB_CONFIG["host"],
+                    port=int(DB_CONFIG["port"]) if DB_CONFIG["port"] else None,
+                    min_size=POOL_MIN_CONN,
+                    max_size=POOL_MAX_CONN,
+                    max_inactive_connection_lifetime=ASYNC_POOL_MAX_IDLE_TIME,
+                )
+                logger.info(f"Created async database pool ({POOL_MIN_CONN}-{POOL_MAX_CONN} connections)")
+    return _pool
+
+
+@asynccontextmanager
+async def get_async_connection():
+    """Соединение из асинхронного пула; возвращается в пул при выходе"""
+    pool = await get_async_pool()
+    async with pool.acquire(timeout=POOL_ACQUIRE_TIMEOUT) as conn:
+        yield conn
+
+
+async def close_async_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -0,0 +1,41 @@
+from repositories.async_connection import get_async_connection
+
+
+async def get_user_by_email(user_email) -> dict | None:
+    query = "SELECT user_id, email, balance FROM users WHERE email = $1"
+    async with get_async_connection() as conn:
+        row = await conn.fetchrow(query, user_email)
+        return dict(row) if row else None
+
+
+async def email_exists(user_email) -> bool:
+    query = "SELECT EXISTS (SELECT 1 FROM users WHERE email = $1)"
+    async with get_async_connection() as conn:
+        return await conn.fetchval(query, user_email)
+
+
+async def get_password_hash_by_email(user_email) -> str | None:
+    query = "SELECT password FROM users WHERE email = $1"
+    async with get_async_connection() as conn:
+        return await conn.fetchval(query, user_email)
+
+
+async def is_admin(user_id) -> bool:
+    query = "SELECT EXISTS (SELECT 1 FROM users WHERE user_id = $1 AND role = 'admin')"
+    async with get_async_connection() as conn:
+        return await conn.fetchval(query, int(user_id))
+
+
+async def registration(email: str, password_hash: str) -> int | None:
+    """
+    Добавляет пользователя
+    :return: user_id нового пользователя или None, если email уже зарегистрирован
+    """
+    query = """
+        INSERT INTO users (email, password, balance)
+        VALUES ($1, $2, 0)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING user_id
+    """
+    async with get_async_connection() as conn:
+        return await conn.fetchval(query, email, password_hash)
@@ -1,6 +1,7 @@
 import psycopg2
 import psycopg2.extras
-from settings import DB_CONFIG
+import psycopg2.errors
+from repositories.connection import get_connection
 from pandas import DataFrame
 
 
@@ -25,7 +26,7 @@ def get_user_cart(user_id: int) -> list[dict]:
         JOIN products p ON c.product_id = p.product_id
         WHERE c.user_id = %s;
     """
-    with psycopg2.connect(**DB_CONFIG) as conn:
+    with get_connection() as conn:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             cur.execute(query, (user_id,))
             return cur.fetchall()
@@ -37,7 +38,7 @@ def clear_user_cart(user_id: int) -> None:
     """
     print(f"Clearing cart for user_id: {user_id}")
     query = "DELETE FROM carts WHERE user_id = %s;"
-    with psycopg2.connect(**DB_CONFIG) as conn:
+    with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(query, (user_id,))
             conn.commit()
@@ -52,7 +53,7 @@ def update_cart_item_quantity(user_id: int, product_id: int, new_quantity: int)
     if new_quantity == 0:
         # Удаляем товар из корзины
         query = "DELETE FROM carts WHERE user_id = %s AND product_id = %s;"
-        with psycopg2.connect(**DB_CONFIG) as conn:
+        with get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(query, (user_id, product_id))
                 conn.commit()
@@ -63,90 +64,40 @@ def update_cart_item_quantity(user_id: int, product_id: int, new_quantity: int)
             SET quantity = %s
             WHERE user_id = %s AND product_id = %s;
         """
-        with psycopg2.connect(**DB_CONFIG) as conn:
+        with get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(query, (new_quantity, user_id, product_id))
                 conn.commit()
 
 
-def get_cart_total(user_id: int) -> dict:
+def checkout_cart(user_id: int, quantity_changes: dict = None) -> dict:
     """
-    Рассчитать общую стоимость товаров в корзине пользователя.
-    Возвращает общую стоимость и количество товаров.
-    """
-    print(f"Calculating cart total for user_id: {user_id}")
-    query = """
-        SELECT 
-            SUM(p.price * c.quantity) AS total_price,
-            SUM(c.quantity) AS total_quantity
-        FROM carts c
-        JOIN products p ON c.product_id = p.product_id
-        WHERE c.user_id = %s;
-    """
-    with psycopg2.connect(**DB_CONFIG) as conn:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(query, (user_id,))
-            result = cur.fetchone()
-            return result if result else {'total_price': 0, 'total_quantity': 0}
-
-
-def checkout_cart(user_id: int) -> int:
-    """
-    Переносит товары из корзины пользователя в таблицу orders и создает запись о новом заказе.
-    Возвращает ID нового заказа.
+    Оформляет заказ одним обращением к БД через серверную функцию checkout_cart
+    (migrations/functions.sql): применяет изменения количества, списывает баланс и остатки,
+    создает заказ с позициями и очищает корзину в одной транзакции.
+    Возвращает словарь с ID заказа, суммой заказа, новым балансом и email пользователя и списком ID купленных товаров.
     """
     print(f"Checking out cart for user_id: {user_id}")
-
-    # SQL-запросы
-    query_create_order = """
-        INSERT INTO orders (user_id, order_date, status)
-        VALUES (%s, NOW(), 'Pending')
-        RETURNING order_id;
-    """
-    query_get_cart_items = """
-        SELECT product_id, quantity
-        FROM carts
-        WHERE user_id = %s;
-    """
-    query_insert_order_items = """
-        INSERT INTO order_items (order_id, product_id, quantity)
-        VALUES (%s, %s, %s);
-    """
-    query_clear_cart = """
-        DELETE FROM carts
-        WHERE user_id = %s;
-    """
-
-    with psycopg2.connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
-            try:
-                # 1. Создаем новый заказ
-                cur.execute(query_create_order, (user_id,))
-                order_id = cur.fetchone()[0]
-
-                # 2. Получаем товары из корзины
-                cur.execute(query_get_cart_items, (user_id,))
-                cart_items = cur.fetchall()
-
-                if not cart_items:
-                    raise ValueError("Cart is empty. Cannot create an order.")
-
-                # 3. Переносим товары из корзины в order_items
-                for item in cart_items:
-                    product_id, quantity = item
-                    cur.execute(query_insert_order_items, (order_id, product_id, quantity))
-
-                # 4. Очищаем корзину
-                cur.execute(query_clear_cart, (user_id,))
-
-                # Фиксируем все изменения
-                conn.commit()
-
-                return order_id
-
-            except Exception as e:
-                # В случае ошибки откатываем транзакцию
-                conn.rollback()
-                print(f"Error during checkout: {e}")
-                raise
-
+    quantity_changes = quantity_changes or {}
+    query = """
+        SELECT c.new_order_id AS order_id, c.order_total AS total_price, c.remaining_balance AS balance,
+               c.purchased_product_ids AS product_ids, u.email
+        FROM checkout_cart(%s, %s::int[], %s::int[]) c
+        JOIN users u ON u.user_id = %s;
+    """
+    params = (
+        user_id,
+        [int(product_id) for product_id in quantity_changes],
+        [int(quantity) for quantity in quantity_changes.values()],
+        user_id,
+    )
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(query, params)
+                return cur.fetchone()
+    except psycopg2.errors.RaiseException as e:
+        # Бизнес-ошибки из функции (пустая корзина, нехватка средств или товара)
+        print(f"Error during checkout: {e.diag.message_primary}")
+        raise ValueError(e.diag.message_primary) from e
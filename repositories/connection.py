@@ -0,0 +1,218 @@
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from settings import (
+    DB_CONFIG,
+    POOL_MIN_CONN,
+    POOL_MAX_CONN,
+    POOL_MAX_LIFETIME,
+    POOL_HEALTH_CHECK_INTERVAL,
+    POOL_ACQUIRE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений с PostgreSQL.
+
+    Поверх psycopg2.pool.ThreadedConnectionPool добавляет ожидание свободного
+    соединения (вместо PoolError при исчерпании), проверку живости соединений,
+    пересоздание соединений по истечении max_lifetime и метрики ожидания/использования.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, max_lifetime: float, health_check_interval: float,
+                 acquire_timeout: float, **db_config):
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **db_config)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._max_lifetime = max_lifetime
+        self._health_check_interval = health_check_interval
+        self._acquire_timeout = acquire_timeout
+        # Время создания и последнего использования соединений (по id объекта соединения)
+        self._created_at = {}
+        self._last_used = {}
+        self._metrics = {
+            "acquired": 0,
+            "released": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+        }
+        self._maxconn = maxconn
+
+    def getconn(self):
+        """
+        Взять соединение из пула, при необходимости дождавшись свободного слота.
+        :return: соединение psycopg2
+        """
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self._acquire_timeout):
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise psycopg2.pool.PoolError(
+                f"Timed out after {self._acquire_timeout}s waiting for a database connection"
+            )
+        waited = time.monotonic() - started
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._metrics["acquired"] += 1
+            self._metrics["in_use"] += 1
+            self._metrics["peak_in_use"] = max(self._metrics["peak_in_use"], self._metrics["in_use"])
+            self._metrics["wait_time_total"] += waited
+            self._metrics["wait_time_max"] = max(self._metrics["wait_time_max"], waited)
+        return conn
+
+    def putconn(self, conn, close: bool = False) -> None:
+        """
+        Вернуть соединение в пул.
+        :param conn: соединение, полученное через getconn
+        :param close: закрыть соединение вместо возврата в пул
+        """
+        try:
+            if not close and not conn.closed:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            self._last_used[id(conn)] = time.monotonic()
+        except psycopg2.Error as e:
+            logger.warning(f"Discarding broken connection: {e}")
+            close = True
+        finally:
+            self._release(conn, close or conn.closed)
+
+    @contextmanager
+    def connection(self):
+        """
+        Контекстный менеджер: коммит при успешном выходе, откат при исключении,
+        соединение всегда возвращается в пул.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def stats(self) -> dict:
+        """
+        Метрики пула: ожидание соединений, текущая и пиковая загрузка, пересозданные соединения.
+        """
+        with self._lock:
+            stats = dict(self._metrics)
+        stats["max_connections"] = self._maxconn
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["acquired"] if stats["acquired"] else 0.0
+        return stats
+
+    def closeall(self) -> None:
+        self._pool.closeall()
+
+    def _checkout(self):
+        while True:
+            conn = self._pool.getconn()
+            now = time.monotonic()
+            key = id(conn)
+            created_at = self._created_at.setdefault(key, now)
+
+            if conn.closed:
+                self._discard(conn)
+                continue
+
+            if self._max_lifetime and now - created_at > self._max_lifetime:
+                logger.info("Recycling database connection after max lifetime")
+                with self._lock:
+                    self._metrics["recycled"] += 1
+                self._discard(conn)
+                continue
+
+            last_used = self._last_used.get(key, created_at)
+            if now - last_used > self._health_check_interval and not self._is_alive(conn):
+                with self._lock:
+                    self._metrics["health_check_failures"] += 1
+                self._discard(conn)
+                continue
+
+            return conn
+
+    def _is_alive(self, conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Database connection failed health check: {e}")
+            return False
+
+    def _discard(self, conn) -> None:
+        self._created_at.pop(id(conn), None)
+        self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def _release(self, conn, close: bool) -> None:
+        try:
+            if close:
+                self._discard(conn)
+            else:
+                self._pool.putconn(conn)
+        finally:
+            with self._lock:
+                self._metrics["released"] += 1
+                self._metrics["in_use"] -= 1
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Общий для процесса пул соединений, создается при первом обращении."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    POOL_MIN_CONN,
+                    POOL_MAX_CONN,
+                    POOL_MAX_LIFETIME,
+                    POOL_HEALTH_CHECK_INTERVAL,
+                    POOL_ACQUIRE_TIMEOUT,
+                    **DB_CONFIG,
+                )
+                logger.info(f"Created database connection pool ({POOL_MIN_CONN}-{POOL_MAX_CONN} connections)")
+    return _pool
+
+
+def get_connection():
+    """
+    Получить соединение из общего пула.
+    Использование: with get_connection() as conn: ...
+    """
+    return get_pool().connection()
+
+
+def get_pool_stats() -> dict:
+    return get_pool().stats()
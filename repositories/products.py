@@ -1,57 +1,144 @@
 import psycopg2
 import psycopg2.extras
-from settings import DB_CONFIG
+from repositories.connection import get_connection
 from pandas import DataFrame
 
 
 def get_products_names_id() -> list[dict]:
     print("Receiving products")
     query = "SELECT name, product_id FROM products;"
-    with psycopg2.connect(**DB_CONFIG) as conn:
+    with get_connection() as conn:
         with conn.cursor(cursor_factory = psycopg2.extras.RealDictCursor) as cur:
             cur.execute(query)
             return cur.fetchall()
 
 
+def search_products_by_name(search_query: str, limit: int, threshold: float) -> list[dict]:
+    """
+    Нечеткий поиск товаров по названию через pg_trgm (GIN-индекс idx_products_name_trgm).
+    Возвращает до limit товаров, отсортированных по убыванию сходства (word_similarity, от 0 до 1).
+    """
+    print(f"Searching products for query: {search_query}")
+    set_threshold = "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true);"
+    query = """
+        SELECT product_id, name, word_similarity(%(query)s, name) AS score
+        FROM products
+        WHERE %(query)s <%% name
+        ORDER BY score DESC, product_id
+        LIMIT %(limit)s;
+    """
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(set_threshold, (str(threshold),))
+            cur.execute(query, {"query": search_query, "limit": limit})
+            return cur.fetchall()
+
+
+# Допустимые поля сортировки для filter_products (имя -> выражение SQL)
+PRODUCT_SORT_COLUMNS = {
+    "price": "price",
+    "name": "name",
+    "stock_quantity": "stock_quantity",
+    "product_id": "product_id",
+}
+
+
+def filter_products(manufacturer_id: int = None, min_price: float = None, max_price: float = None,
+                    sort_by: str = "price", descending: bool = False, limit: int = 50) -> list[dict]:
+    """
+    Фильтрация товаров по производителю и диапазону цен на стороне БД.
+    Условия с None не применяются. Запрос обслуживается индексами
+    idx_products_price_id и idx_products_manufacturer_price_id.
+    """
+    print(f"Filtering products: manufacturer_id={manufacturer_id}, price=[{min_price}, {max_price}], "
+          f"sort_by={sort_by}, descending={descending}, limit={limit}")
+    if sort_by not in PRODUCT_SORT_COLUMNS:
+        raise ValueError(f"Unsupported sort column: {sort_by}")
+
+    conditions = []
+    params = {"limit": limit}
+    if manufacturer_id is not None:
+        conditions.append("manufacturer_id = %(manufacturer_id)s")
+        params["manufacturer_id"] = manufacturer_id
+    if min_price is not None:
+        conditions.append("price >= %(min_price)s")
+        params["min_price"] = min_price
+    if max_price is not None:
+        conditions.append("price <= %(max_price)s")
+        params["max_price"] = max_price
+
+    direction = "DESC" if descending else "ASC"
+    query = f"""
+        SELECT product_id, name, price, stock_quantity, manufacturer_id
+        FROM products
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY {PRODUCT_SORT_COLUMNS[sort_by]} {direction}, product_id {direction}
+        LIMIT %(limit)s;
+    """
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+PRODUCT_DETAILS_QUERY = """
+    SELECT 
+        p.product_id,
+        p.name AS product_name,
+        p.price,
+        p.description,
+        p.warranty_period,
+        p.stock_quantity,
+        m.manufacturer_id,
+        m.name AS manufacturer_name,
+        m.country AS manufacturer_country,
+        COALESCE(
+            json_agg(
+                json_build_object(
+                    'review_id', r.review_id,
+                    'rating', r.rating,
+                    'review_text', r.review_text,
+                    'review_date', r.review_date,
+                    'user_id', r.user_id
+                )
+            ) FILTER (WHERE r.review_id IS NOT NULL), 
+            '[]'
+        ) AS reviews
+    FROM products p
+    LEFT JOIN manufacturers m ON p.manufacturer_id = m.manufacturer_id
+    LEFT JOIN reviews r ON p.product_id = r.product_id
+    WHERE {condition}
+    GROUP BY p.product_id, m.manufacturer_id;
+"""
+
+
 def get_product_details_by_id(product_id: int) -> dict:
     print(f"Receiving details for product_id: {product_id}")
-    query = """
-        SELECT 
-            p.product_id,
-            p.name AS product_name,
-            p.price,
-            p.description,
-            p.warranty_period,
-            p.stock_quantity,
-            m.manufacturer_id,
-            m.name AS manufacturer_name,
-            m.country AS manufacturer_country,
-            COALESCE(
-                json_agg(
-                    json_build_object(
-                        'review_id', r.review_id,
-                        'rating', r.rating,
-                        'review_text', r.review_text,
-                        'review_date', r.review_date,
-                        'user_id', r.user_id
-                    )
-                ) FILTER (WHERE r.review_id IS NOT NULL), 
-                '[]'
-            ) AS reviews
-        FROM products p
-        LEFT JOIN manufacturers m ON p.manufacturer_id = m.manufacturer_id
-        LEFT JOIN reviews r ON p.product_id = r.product_id
-        WHERE p.product_id = %s
-        GROUP BY p.product_id, m.manufacturer_id;
-    """
-
-    with psycopg2.connect(**DB_CONFIG) as conn:
+    query = PRODUCT_DETAILS_QUERY.format(condition="p.product_id = %s")
+
+    with get_connection() as conn:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             cur.execute(query, (product_id,))
             result = cur.fetchone()
             return result if result else {}
 
 
+def get_product_details_by_ids(product_ids: list[int]) -> list[dict]:
+    """
+    Получить детальную информацию сразу о нескольких продуктах одним запросом.
+    Продукты, которых нет в базе, в результат не попадают.
+    """
+    print(f"Receiving details for product_ids: {product_ids}")
+    if not product_ids:
+        return []
+    query = PRODUCT_DETAILS_QUERY.format(condition="p.product_id = ANY(%s)")
+
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query, (list(product_ids),))
+            return cur.fetchall()
+
+
 
 def add_product_to_cart(user_id: int, product_id: int, quantity: int) -> None:
     print(f"Adding product {product_id} to cart for user {user_id} with quantity {quantity}")
@@ -62,7 +149,7 @@ def add_product_to_cart(user_id: int, product_id: int, quantity: int) -> None:
         WHERE user_id = %s AND product_id = %s;
     """
     
-    with psycopg2.connect(**DB_CONFIG) as conn:
+    with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(check_query, (user_id, product_id))
             existing_item = cur.fetchone()
@@ -93,7 +180,7 @@ def decrease_product_stock(product_id: int, quantity: int) -> None:
         SET stock_quantity = stock_quantity - %s
         WHERE product_id = %s AND stock_quantity >= %s;
     """
-    with psycopg2.connect(**DB_CONFIG) as conn:
+    with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(query, (quantity, product_id, quantity))
             if cur.rowcount == 0:
@@ -103,7 +190,7 @@ def decrease_product_stock(product_id: int, quantity: int) -> None:
 def peek_products_stock(product_id: int) -> int:
     print(f"Checking stock for product {product_id}")
     query = "SELECT stock_quantity FROM products WHERE product_id = %s;"
-    with psycopg2.connect(**DB_CONFIG) as conn:
+    with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(query, (product_id,))
             result = cur.fetchone()
@@ -112,6 +199,45 @@ def peek_products_stock(product_id: int) -> int:
             return result[0]
 
 
+def get_products_stock(product_ids: list[int] = None) -> list[dict]:
+    """
+    Получить остатки на складе одним запросом: для всех продуктов или только для указанных.
+    """
+    print(f"Checking stock for products {product_ids if product_ids is not None else 'all'}")
+    if product_ids is None:
+        query = "SELECT product_id, name, stock_quantity FROM products ORDER BY product_id;"
+        params = None
+    else:
+        query = """
+            SELECT product_id, name, stock_quantity
+            FROM products
+            WHERE product_id = ANY(%s)
+            ORDER BY product_id;
+        """
+        params = (list(product_ids),)
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+def get_low_stock_products(threshold: int) -> list[dict]:
+    """
+    Получить продукты, остаток которых не превышает порог.
+    """
+    print(f"Receiving products with stock <= {threshold}")
+    query = """
+        SELECT product_id, name, stock_quantity
+        FROM products
+        WHERE stock_quantity <= %s
+        ORDER BY stock_quantity, product_id;
+    """
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query, (threshold,))
+            return cur.fetchall()
+
+
 def add_new_product(name: str, price: float, description: str, warranty_period: int, manufacturer_id: int, stock_quantity: int) -> int:
     """
     Добавить новый продукт в таблицу products.
@@ -123,7 +249,7 @@ def add_new_product(name: str, price: float, description: str, warranty_period:
         VALUES (%s, %s, %s, %s, %s, %s)
         RETURNING product_id;
     """
-    with psycopg2.connect(**DB_CONFIG) as conn:
+    with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(query, (name, price, description, warranty_period, manufacturer_id, stock_quantity))
             product_id = cur.fetchone()[0]
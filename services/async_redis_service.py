@@ -0,0 +1,175 @@
+"""
+Асинхронный вариант RedisService (redis.asyncio) для эндпоинтов FastAPI.
+
+Ключи, форматы и схемы значений те же, что у RedisService: токены и сессии, записанные
+API, читает Streamlit-приложение, и наоборот. Здесь собраны только операции, нужные main2.py.
+"""
+import json
+import logging
+import threading
+
+import redis.asyncio
+
+from settings import REDIS_CONFIG
+from services.redis_service import CACHE_DATA_SCHEMA
+from services.serialization import get_serializer, SerializationError
+
+logger = logging.getLogger(__name__)
+
+_async_redis_service = None
+_lock = threading.Lock()
+
+
+def _create_async_connection_pool(decode_responses: bool) -> redis.asyncio.ConnectionPool:
+    return redis.asyncio.ConnectionPool(
+        host=REDIS_CONFIG['host'],
+        port=REDIS_CONFIG['port'],
+        db=REDIS_CONFIG['db'],
+        password=REDIS_CONFIG['password'],
+        max_connections=REDIS_CONFIG['max_connections'],
+        socket_timeout=REDIS_CONFIG['socket_timeout'],
+        socket_connect_timeout=REDIS_CONFIG['socket_connect_timeout'],
+        health_check_interval=REDIS_CONFIG['health_check_interval'],
+        decode_responses=decode_responses
+    )
+
+
+def get_async_redis_service() -> "AsyncRedisService":
+    """Общий для процесса экземпляр AsyncRedisService (соединения открываются при первом запросе)"""
+    global _async_redis_service
+    if _async_redis_service is None:
+        with _lock:
+            if _async_redis_service is None:
+                _async_redis_service = AsyncRedisService()
+    return _async_redis_service
+
+
+class AsyncRedisService:
+    def __init__(self, connection_pool: redis.asyncio.ConnectionPool = None,
+                 binary_connection_pool: redis.asyncio.ConnectionPool = None):
+        self.redis_client = redis.asyncio.Redis(
+            connection_pool=connection_pool or _create_async_connection_pool(decode_responses=True)
+        )
+        self.binary_client = redis.asyncio.Redis(
+            connection_pool=binary_connection_pool or _create_async_connection_pool(decode_responses=False)
+        )
+        self.serializer = get_serializer()
+
+    def load_value(self, data, schema: str):
+        """
+        Декодировать значение, прочитанное через binary_client
+        :return: значение или None, если значения нет или оно записано в другой схеме
+        """
+        if data is None:
+            return None
+        try:
+            return self.serializer.loads(data, schema)
+        except SerializationError as e:
+            logger.warning(f"Discarding cached value: {e}")
+            return None
+
+    # Token management
+    async def store_token(self, user_id: str, token: str, ttl: int = 3600):
+        """Store user token with TTL"""
+        try:
+            await self.redis_client.setex(f"token:{user_id}", ttl, token)
+            logger.info(f"Stored token for user {user_id}")
+        except Exception as e:
+            logger.error(f"Failed to store token for user {user_id}: {e}")
+            raise
+
+    async def get_token(self, user_id: str) -> str:
+        """Get user token"""
+        try:
+            return await self.redis_client.get(f"token:{user_id}")
+        except Exception as e:
+            logger.error(f"Failed to get token for user {user_id}: {e}")
+            raise
+
+    async def delete_token(self, user_id: str):
+        """Delete user token"""
+        try:
+            await self.redis_client.delete(f"token:{user_id}")
+            logger.info(f"Deleted token for user {user_id}")
+        except Exception as e:
+            logger.error(f"Failed to delete token for user {user_id}: {e}")
+            raise
+
+    # Session management (тот же индекс user:{user_id}:sessions, что у RedisService)
+    def _user_sessions_key(self, user_id) -> str:
+        return f"user:{user_id}:sessions"
+
+    async def store_session(self, session_id: str, data: dict, ttl: int = 1800):
+        """Store session data and register it in the user's session index"""
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.setex(f"session:{session_id}", ttl, json.dumps(data))
+            if data.get('user_id') is not None:
+                index_key = self._user_sessions_key(data['user_id'])
+                pipe.sadd(index_key, session_id)
+                pipe.expire(index_key, ttl, nx=True)
+                pipe.expire(index_key, ttl, gt=True)
+            await pipe.execute()
+            logger.info(f"Stored session {session_id} with TTL {ttl}")
+        except Exception as e:
+            logger.error(f"Failed to store session {session_id}: {e}")
+            raise
+
+    async def get_session(self, session_id: str, ttl: int = None) -> dict:
+        """
+        Get session data
+        :param ttl: если указан, срок жизни сессии продлевается на ttl секунд (скользящее истечение)
+        """
+        try:
+            key = f"session:{session_id}"
+            data = await (self.redis_client.getex(key, ex=ttl) if ttl else self.redis_client.get(key))
+            if data:
+                session_data = json.loads(data)
+                if ttl and session_data.get('user_id') is not None:
+                    await self.redis_client.expire(self._user_sessions_key(session_data['user_id']), ttl, gt=True)
+                return session_data
+            logger.warning(f"Session {session_id} not found")
+            return None
+        except Exception as e:
+            logger.error(f"Failed to get session {session_id}: {e}")
+            raise
+
+    async def delete_session(self, session_id: str):
+        """Delete session and remove it from the user's session index"""
+        try:
+            key = f"session:{session_id}"
+            data = await self.redis_client.get(key)
+            pipe = self.redis_client.pipeline()
+            pipe.delete(key)
+            if data:
+                user_id = json.loads(data).get('user_id')
+                if user_id is not None:
+                    pipe.srem(self._user_sessions_key(user_id), session_id)
+            await pipe.execute()
+            logger.info(f"Deleted session {session_id}")
+        except Exception as e:
+            logger.error(f"Failed to delete session {session_id}: {e}")
+            raise
+
+    # Cache management
+    async def cache_data(self, key: str, data: dict, ttl: int = 300):
+        """Cache data with TTL"""
+        try:
+            await self.binary_client.setex(f"cache:{key}", ttl, self.serializer.dumps(data, CACHE_DATA_SCHEMA))
+        except Exception as e:
+            logger.error(f"Failed to cache data for key {key}: {e}")
+            raise
+
+    async def get_cached_data(self, key: str) -> dict:
+        """Get cached data"""
+        try:
+            return self.load_value(await self.binary_client.get(f"cache:{key}"), CACHE_DATA_SCHEMA)
+        except Exception as e:
+            logger.error(f"Failed to get cached data for key {key}: {e}")
+            raise
+
+    async def close(self) -> None:
+        """Закрыть соединения обоих пулов (при остановке приложения)"""
+        for client in (self.redis_client, self.binary_client):
+            await client.aclose()
+            await client.connection_pool.disconnect()
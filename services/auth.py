@@ -1,34 +1,43 @@
-import repositories.users
-import bcrypt
+import repositories.async_users
+from services.redis_service import LocalCache
+from settings import AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL, AUTH_NEGATIVE_CACHE_TTL
 
 
-users = repositories.users.get_users_with_password()
+# Отметка в кеше: пользователя с таким email нет
+_UNKNOWN_USER = ""
 
 
 class Authotize():
 
     def __init__(self):
-        self.users = self.get_users()
+        # Хеши паролей читаются по одному при входе и недолго хранятся в памяти процесса;
+        # отсутствие пользователя кешируется на меньший срок, чтобы новая регистрация была видна быстро
+        self.credentials = LocalCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL)
 
-    def get_users(self):
-        users = repositories.users.get_users_with_password()
-        return {user["email"]: user["password"] for user in users}
-
-    def auth(self, email, password: str):
-        # print(self.users)
-        passw = None
-
-        if email in self.users:
-            passw = self.users[email]
+    def _remember(self, email, passw):
+        if passw is None:
+            self.credentials.set(email, _UNKNOWN_USER, ttl=AUTH_NEGATIVE_CACHE_TTL)
         else:
+            self.credentials.set(email, passw)
+        return passw
+
+    def forget(self, email) -> None:
+        """Убрать email из кеша (после регистрации или смены пароля)"""
+        self.credentials.invalidate(keys=[email])
+
+    async def auth_async(self, email, password: str, password_hasher=None):
+        """
+        Проверка пароля без блокировки цикла событий: хеш читается через асинхронный пул БД,
+        bcrypt выполняется в пуле процессов
+        :param password_hasher: PasswordHasher; по умолчанию общий для процесса
+        :raises PasswordPoolBusy: пул паролей перегружен
+        """
+        passw = self.credentials.get(email)
+        if passw is None:
+            passw = self._remember(email, await repositories.async_users.get_password_hash_by_email(email))
+        if not passw:
             return False
-
-        if (passw == None):
-            return False
-            
-        try:
-            # Проверяем хешированный пароль
-            return bcrypt.checkpw(password.encode("utf-8"), passw.encode("utf-8"))
-        except Exception as e:
-            print(f"Error checking password: {e}")
-            return False
\ No newline at end of file
+        if password_hasher is None:
+            from services.passwords import get_password_hasher
+            password_hasher = get_password_hasher()
+        return await password_hasher.verify(password, passw)
@@ -1,40 +1,88 @@
 from pandas import DataFrame
 import repositories.cart
+import services.products
+import services.user
 import pandas as pd
-from services.redis_service import RedisService
+from services.redis_service import get_redis_service
+
+redis_service = get_redis_service()
+
+CART_COLUMNS = ["product_id", "quantity", "added_date", "product_name", "price",
+                "description", "stock_quantity", "warranty_period"]
+
+
+def _sync_cached_cart(user_id: int, apply) -> None:
+    """
+    Применяет изменение к корзине в Redis после записи в БД.
+    Если Redis не ответил, удаляет корзину из кеша, чтобы она перечиталась из БД.
+    """
+    try:
+        apply()
+    except Exception as e:
+        print(f"Failed to update cached cart for user ID {user_id}, dropping it: {e}")
+        try:
+            redis_service.delete_cart(user_id)
+        except Exception:
+            pass
+
+
+def _load_cart(user_id: int) -> dict:
+    """Корзина из Redis; при промахе читается из БД одним запросом и кешируется целиком"""
+    cart = redis_service.get_cart(user_id)
+    if cart is not None:
+        print("Retrieved cart from cache")
+        return cart
+
+    # Версия читается до запроса: изменение корзины во время него не даст закешировать устаревшие данные
+    version = redis_service.get_cart_version(user_id)
+    cart_items = repositories.cart.get_user_cart(user_id)
+    redis_service.load_cart(user_id, cart_items, version=version)
+    return {
+        "items": cart_items,
+        "total_quantity": sum(item['quantity'] for item in cart_items),
+        "total_price": sum(item['quantity'] * item['price'] for item in cart_items),
+    }
 
-redis_service = RedisService()
 
 def fetch_user_cart(user_id: int) -> pd.DataFrame:
     """
     Обертка для получения содержимого корзины пользователя.
+    Количество товаров берется из hash корзины в Redis, информация о товарах - из кеша продуктов,
+    поэтому просмотр корзины обычно не обращается к БД.
 
     :param user_id: ID пользователя, чью корзину нужно получить.
     :return: DataFrame с данными о содержимом корзины.
     """
     try:
         print(f"Fetching cart for user ID: {user_id}")
-        
-        # Try to get from cache first
-        cached_cart = redis_service.get_cached_cart(str(user_id))
-        if cached_cart:
-            print("Retrieved cart from cache")
-            return pd.DataFrame(cached_cart)
-        
-        # If not in cache, get from database
-        cart_items = repositories.cart.get_user_cart(user_id)
-        
-        if not cart_items:
+        cart = _load_cart(user_id)
+
+        if not cart["items"]:
             print("Cart is empty.")
-            return pd.DataFrame(columns=["cart_id", "product_id", "quantity", "added_date",
-                                         "product_name", "price", "description",
-                                         "stock_quantity", "warranty_period"])
-        
-        # Cache the results
-        redis_service.cache_cart(str(user_id), cart_items)
-        
-        print(f"Received {len(cart_items)} items in the cart.")
-        return pd.DataFrame(cart_items)
+            return pd.DataFrame(columns=CART_COLUMNS)
+
+        details_by_id = services.products.fetch_product_details_by_ids(
+            [item['product_id'] for item in cart["items"]]
+        )
+        rows = []
+        for item in cart["items"]:
+            product_details = details_by_id.get(item['product_id'])
+            if not product_details:
+                continue
+            rows.append({
+                "product_id": item['product_id'],
+                "quantity": item['quantity'],
+                "added_date": item['added_date'],
+                "product_name": product_details['product_name'],
+                # Цена, по которой товар учтен в итогах корзины
+                "price": item['price'],
+                "description": product_details['description'],
+                "stock_quantity": product_details['stock_quantity'],
+                "warranty_period": product_details['warranty_period'],
+            })
+
+        print(f"Received {len(rows)} items in the cart.")
+        return pd.DataFrame(rows, columns=CART_COLUMNS)
     except Exception as e:
         print(f"Error while fetching user cart: {e}")
         raise
@@ -50,8 +98,8 @@ def clear_cart(user_id: int) -> None:
         print(f"Clearing cart for user ID: {user_id}")
         repositories.cart.clear_user_cart(user_id)
         
-        # Invalidate cart cache
-        redis_service.redis_client.delete(f"cart:{user_id}")
+        # Пустая корзина сразу записывается в кеш
+        _sync_cached_cart(user_id, lambda: redis_service.load_cart(user_id, []))
         
         print("Cart cleared successfully.")
     except Exception as e:
@@ -71,8 +119,7 @@ def update_cart_item(user_id: int, product_id: int, new_quantity: int) -> None:
         print(f"Updating quantity for product {product_id} in user {user_id}'s cart to {new_quantity}")
         repositories.cart.update_cart_item_quantity(user_id, product_id, new_quantity)
         
-        # Invalidate cart cache
-        redis_service.redis_client.delete(f"cart:{user_id}")
+        _sync_cached_cart(user_id, lambda: redis_service.cart_set_item_quantity(user_id, product_id, new_quantity))
         
         print("Cart item updated successfully.")
     except Exception as e:
@@ -83,13 +130,15 @@ def update_cart_item(user_id: int, product_id: int, new_quantity: int) -> None:
 def calculate_cart_total(user_id: int) -> dict:
     """
     Обертка для расчета общей стоимости товаров в корзине пользователя.
+    Итоги поддерживаются в hash корзины при каждом изменении, отдельный запрос к БД не нужен.
 
     :param user_id: ID пользователя.
     :return: Словарь с общей стоимостью и количеством товаров.
     """
     try:
         print(f"Calculating cart total for user ID: {user_id}")
-        cart_total = repositories.cart.get_cart_total(user_id)
+        cart = _load_cart(user_id)
+        cart_total = {'total_price': cart['total_price'], 'total_quantity': cart['total_quantity']}
         print(f"Cart total calculated: {cart_total}")
         return cart_total
     except Exception as e:
@@ -97,28 +146,43 @@ def calculate_cart_total(user_id: int) -> dict:
         raise
 
 
-def process_checkout(user_id: int) -> int:
+def process_checkout(user_id: int, quantity_changes: dict = None) -> dict:
     """
-    Обертка для оформления заказа. Переносит товары из корзины в таблицу заказов.
+    Обертка для оформления заказа. Одной транзакцией в БД применяет изменения количества,
+    списывает баланс и остатки, переносит товары из корзины в заказ и очищает корзину.
 
     :param user_id: ID пользователя, оформляющего заказ.
-    :return: ID созданного заказа.
+    :param quantity_changes: изменения количества {product_id: новое количество}, 0 - удалить товар.
+    :return: словарь с order_id, total_price, новым balance пользователя, его email и product_ids купленных товаров.
     """
     try:
         print(f"Processing checkout for user ID: {user_id}")
-        order_id = repositories.cart.checkout_cart(user_id)
-        
-        # Invalidate cart cache
-        redis_service.redis_client.delete(f"cart:{user_id}")
-        
-        # Update order status in Redis
-        redis_service.update_order_status(str(order_id), "Pending", str(user_id))
-        
-        print(f"Checkout successful. Order ID: {order_id}")
-        return order_id
+        result = repositories.cart.checkout_cart(user_id, quantity_changes)
     except ValueError as e:
         print(f"Checkout error: {e}")
         raise
     except Exception as e:
         print(f"Unexpected error during checkout for user ID {user_id}: {e}")
-        raise
\ No newline at end of file
+        raise
+
+    # Заказ уже оформлен и оплачен: ошибка кеша после фиксации не должна выглядеть как неудачная покупка,
+    # поэтому каждый шаг только логирует свою ошибку и не мешает остальным
+    order_id = result['order_id']
+    post_commit_steps = [
+        # Корзина очищена в той же транзакции
+        ("cart", lambda: _sync_cached_cart(user_id, lambda: redis_service.load_cart(user_id, []))),
+        # Баланс пользователя изменился
+        ("user", lambda: services.user.invalidate_user(result['email'])),
+        # Остатки купленных товаров изменились
+        ("products", lambda: services.products.invalidate_product_details(result['product_ids'] or [])),
+        ("order status", lambda: redis_service.update_order_status(str(order_id), "Pending", str(user_id))),
+    ]
+    for name, step in post_commit_steps:
+        try:
+            step()
+        except Exception as e:
+            print(f"Failed to update {name} cache after checkout of order {order_id}: {e}")
+
+    print(f"Checkout successful. Order ID: {order_id}")
+    return result
+
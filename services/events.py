@@ -0,0 +1,322 @@
+"""
+Общий для процесса слушатель событий Redis Pub/Sub.
+
+Один фоновый поток на процесс блокируется на сокете PubSub (без опроса по таймеру) и раскладывает
+события по ограниченным очередям подписок. Подписку создает каждая сессия интерфейса;
+событие попадает в очередь, если оно адресовано пользователю подписки или подписка администраторская.
+Диспетчер хранит подписки по слабым ссылкам: когда сессия удаляется, ее очередь исчезает сама.
+
+AsyncEventBroker - то же для asyncio (эндпоинт SSE /events в main2.py): одна задача на процесс
+читает каналы через redis.asyncio и раскладывает события по asyncio-очередям соединений.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import weakref
+
+import redis
+import redis.asyncio
+
+from settings import REDIS_CONFIG
+from services.redis_service import get_redis_service, NOTIFICATION_CHANNELS
+
+logger = logging.getLogger(__name__)
+
+# Сколько событий ждет в очереди одной сессии; при переполнении отбрасываются самые старые
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+# Каналы, события которых получают только администраторы
+ADMIN_CHANNELS = ("admin_notifications",)
+
+# Сколько секунд get_message ждет события, прежде чем поток проверит, не пора ли остановиться
+LISTEN_TIMEOUT = 5.0
+
+MAX_RECONNECT_BACKOFF = 30
+
+# Каналы, которые транслирует эндпоинт /events
+EVENT_STREAM_CHANNELS = NOTIFICATION_CHANNELS + ("new_notification",)
+
+# Раз во столько секунд простаивающему SSE-соединению отправляется комментарий-heartbeat
+SSE_HEARTBEAT_INTERVAL = 15
+
+
+class EventSubscription:
+    """
+    Очередь событий одной сессии; элементы - пары (канал, событие)
+    :param user_id: ID пользователя сессии, события которого нужно получать
+    :param is_admin: получать ли события администраторских каналов
+    """
+
+    def __init__(self, user_id=None, is_admin: bool = False, maxsize: int = SUBSCRIPTION_QUEUE_SIZE):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def accepts(self, channel: str, event: dict) -> bool:
+        if channel in ADMIN_CHANNELS:
+            return self.is_admin
+        return self.user_id is not None and str(event.get('user_id')) == str(self.user_id)
+
+    def put(self, item) -> None:
+        """Положить событие; если очередь полна, самое старое событие отбрасывается"""
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get_events(self) -> list:
+        """Забрать все накопившиеся пары (канал, событие), не блокируясь"""
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+
+class EventDispatcher:
+    """
+    Фоновый поток, читающий каналы уведомлений и раздающий события подпискам
+    :param channels: каналы Pub/Sub
+    """
+
+    def __init__(self, channels: tuple = NOTIFICATION_CHANNELS):
+        self.channels = channels
+        self.redis_service = get_redis_service()
+        self._subscriptions = weakref.WeakSet()
+        self._subscriptions_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def subscribe(self, user_id=None, is_admin: bool = False) -> EventSubscription:
+        """
+        Создать подписку сессии. Вызывающий хранит ссылку на подписку (например, в session_state):
+        пока она жива, подписка получает события.
+        """
+        subscription = EventSubscription(user_id, is_admin)
+        with self._subscriptions_lock:
+            self._subscriptions.add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription) -> None:
+        with self._subscriptions_lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, channel: str, event: dict) -> int:
+        """
+        Разложить событие по подходящим подпискам
+        :return: количество подписок, получивших событие
+        """
+        with self._subscriptions_lock:
+            subscriptions = list(self._subscriptions)
+        delivered = 0
+        for subscription in subscriptions:
+            if subscription.accepts(channel, event):
+                subscription.put((channel, event))
+                delivered += 1
+        return delivered
+
+    def start(self) -> None:
+        """Запустить поток слушателя, если он еще не запущен"""
+        if self._thread is None or not self._thread.is_alive():
+            with _lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._listen, name="redis-event-dispatcher", daemon=True)
+                    self._thread.start()
+                    logger.info(f"Event dispatcher started for channels {self.channels}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _listen(self) -> None:
+        """Цикл потока: подписка, блокирующее чтение и переподключение с экспоненциальной задержкой"""
+        backoff = 1
+        while not self._stop.is_set():
+            pubsub = self.redis_service.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(*self.channels)
+                backoff = 1
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=LISTEN_TIMEOUT)
+                    if message is None:
+                        continue
+                    try:
+                        event = json.loads(message['data'])
+                    except json.JSONDecodeError as e:
+                        logger.error(f"Failed to decode event from channel {message['channel']}: {e}")
+                        continue
+                    self.dispatch(message['channel'], event)
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                logger.warning(f"Event dispatcher disconnected: {e}; reconnecting in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, MAX_RECONNECT_BACKOFF)
+            except Exception as e:
+                logger.error(f"Event dispatcher failed: {e}; reconnecting in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, MAX_RECONNECT_BACKOFF)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+class AsyncEventSubscription(EventSubscription):
+    """Очередь событий одного SSE-соединения"""
+
+    def __init__(self, user_id=None, is_admin: bool = False, maxsize: int = SUBSCRIPTION_QUEUE_SIZE):
+        super().__init__(user_id, is_admin, maxsize)
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, item) -> None:
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except asyncio.QueueEmpty:
+                    pass
+
+    async def next_event(self, timeout: float):
+        """Следующая пара (канал, событие) или None, если за timeout секунд событий не было"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def format_sse(event: str = None, data: dict = None, comment: str = None) -> str:
+    """Сообщение в формате text/event-stream"""
+    if comment is not None:
+        return f": {comment}\n\n"
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class AsyncEventBroker:
+    """
+    Неблокирующий подписчик Redis для asyncio: одно PubSub-соединение на процесс
+    независимо от числа клиентов. Должен использоваться из одного цикла событий.
+    :param channels: каналы Pub/Sub
+    """
+
+    def __init__(self, channels: tuple = EVENT_STREAM_CHANNELS):
+        self.channels = channels
+        self._subscriptions = set()
+        self._task = None
+
+    async def subscribe(self, user_id=None, is_admin: bool = False) -> AsyncEventSubscription:
+        subscription = AsyncEventSubscription(user_id, is_admin)
+        self._subscriptions.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        return subscription
+
+    def unsubscribe(self, subscription: AsyncEventSubscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def dispatch(self, channel: str, event: dict) -> int:
+        delivered = 0
+        for subscription in list(self._subscriptions):
+            if subscription.accepts(channel, event):
+                subscription.put((channel, event))
+                delivered += 1
+        return delivered
+
+    async def stream(self, subscription: AsyncEventSubscription, is_disconnected=None,
+                     heartbeat: float = SSE_HEARTBEAT_INTERVAL):
+        """
+        Асинхронный генератор сообщений SSE для подписки; по завершении подписка удаляется
+        :param is_disconnected: корутинная функция, возвращающая True, когда клиент отключился
+        """
+        try:
+            yield format_sse(comment="connected")
+            while True:
+                item = await subscription.next_event(heartbeat)
+                if is_disconnected is not None and await is_disconnected():
+                    break
+                if item is None:
+                    yield format_sse(comment="heartbeat")
+                    continue
+                channel, event = item
+                yield format_sse(channel, event)
+        finally:
+            self.unsubscribe(subscription)
+
+    async def _listen(self) -> None:
+        """Задача чтения каналов; работает, пока есть подписки, переподключается с задержкой"""
+        backoff = 1
+        while self._subscriptions:
+            # Отдельное соединение без socket_timeout: подписчик может долго ничего не получать
+            client = redis.asyncio.Redis(
+                host=REDIS_CONFIG["host"],
+                port=REDIS_CONFIG["port"],
+                db=REDIS_CONFIG["db"],
+                password=REDIS_CONFIG["password"],
+                socket_connect_timeout=REDIS_CONFIG["socket_connect_timeout"],
+                decode_responses=True,
+            )
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self.channels)
+                backoff = 1
+                while self._subscriptions:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=LISTEN_TIMEOUT)
+                    if message is None:
+                        continue
+                    try:
+                        event = json.loads(message['data'])
+                    except json.JSONDecodeError as e:
+                        logger.error(f"Failed to decode event from channel {message['channel']}: {e}")
+                        continue
+                    self.dispatch(message['channel'], event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Async event broker disconnected: {e}; reconnecting in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_RECONNECT_BACKOFF)
+            finally:
+                try:
+                    await pubsub.aclose()
+                    await client.aclose()
+                except Exception:
+                    pass
+
+
+_event_dispatcher = None
+_event_broker = None
+_lock = threading.RLock()
+
+
+def get_event_dispatcher() -> EventDispatcher:
+    """Общий для процесса диспетчер событий"""
+    global _event_dispatcher
+    if _event_dispatcher is None:
+        with _lock:
+            if _event_dispatcher is None:
+                _event_dispatcher = EventDispatcher()
+    return _event_dispatcher
+
+
+def get_event_broker() -> AsyncEventBroker:
+    """Общий для процесса асинхронный брокер событий"""
+    global _event_broker
+    if _event_broker is None:
+        with _lock:
+            if _event_broker is None:
+                _event_broker = AsyncEventBroker()
+    return _event_broker
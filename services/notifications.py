@@ -1,8 +1,11 @@
 from datetime import datetime
-import json
-from services.redis_service import RedisService
+import re
+from services.redis_service import get_redis_service
 
-redis_service = RedisService()
+redis_service = get_redis_service()
+
+# ID уведомления - ID записи потока Redis
+NOTIFICATION_ID_PATTERN = re.compile(r"^\d+-\d+$")
 
 def create_notification(user_id: int, message: str, notification_type: str = "info") -> None:
     """
@@ -12,18 +15,15 @@ def create_notification(user_id: int, message: str, notification_type: str = "in
     :param notification_type: Тип уведомления (info, success, warning, error)
     """
     notification = {
-        "id": f"notif_{datetime.now().timestamp()}",
-        "user_id": user_id,
+        "user_id": str(user_id),
         "message": message,
         "type": notification_type,
         "created_at": datetime.now().isoformat(),
-        "read": False
     }
     
-    # Сохраняем уведомление в Redis
-    redis_service.redis_client.lpush(f"notifications:{user_id}", json.dumps(notification))
-    # Ограничиваем количество уведомлений (храним последние 50)
-    redis_service.redis_client.ltrim(f"notifications:{user_id}", 0, 49)
+    # Сохраняем уведомление в потоке пользователя; хранятся последние NOTIFICATION_HISTORY_LIMIT
+    notification["id"] = redis_service.add_notification(user_id, notification)
+    notification["read"] = False
     
     # Публикуем событие о новом уведомлении
     redis_service.publish_event("new_notification", {
@@ -31,15 +31,17 @@ def create_notification(user_id: int, message: str, notification_type: str = "in
         "notification": notification
     })
 
-def get_user_notifications(user_id: int, limit: int = 10) -> list:
+def get_user_notifications(user_id: int, limit: int = 10, before: str = None) -> list:
     """
-    Получает уведомления пользователя
+    Получает уведомления пользователя, от новых к старым
     :param user_id: ID пользователя
     :param limit: Максимальное количество уведомлений
+    :param before: ID последнего уведомления предыдущей страницы (для следующей страницы)
     :return: Список уведомлений
     """
-    notifications = redis_service.redis_client.lrange(f"notifications:{user_id}", 0, limit - 1)
-    return [json.loads(n) for n in notifications]
+    if before is not None and not NOTIFICATION_ID_PATTERN.match(before):
+        return []
+    return redis_service.get_notifications(user_id, limit=limit, before=before)
 
 def mark_notification_as_read(user_id: int, notification_id: str) -> None:
     """
@@ -47,17 +49,16 @@ def mark_notification_as_read(user_id: int, notification_id: str) -> None:
     :param user_id: ID пользователя
     :param notification_id: ID уведомления
     """
-    notifications = get_user_notifications(user_id, limit=50)
-    for notification in notifications:
-        if notification["id"] == notification_id:
-            notification["read"] = True
-            # Обновляем уведомление в Redis
-            redis_service.redis_client.lset(
-                f"notifications:{user_id}",
-                notifications.index(notification),
-                json.dumps(notification)
-            )
-            break
+    if not NOTIFICATION_ID_PATTERN.match(notification_id):
+        return
+    redis_service.mark_notification_read(user_id, notification_id)
+
+def mark_all_notifications_as_read(user_id: int) -> None:
+    """
+    Отмечает все уведомления пользователя как прочитанные
+    :param user_id: ID пользователя
+    """
+    redis_service.mark_all_notifications_read(user_id)
 
 def get_unread_notifications_count(user_id: int) -> int:
     """
@@ -65,8 +66,7 @@ def get_unread_notifications_count(user_id: int) -> int:
     :param user_id: ID пользователя
     :return: Количество непрочитанных уведомлений
     """
-    notifications = get_user_notifications(user_id, limit=50)
-    return sum(1 for n in notifications if not n["read"])
+    return redis_service.get_unread_notification_count(user_id)
 
 # Предопределенные типы уведомлений
 def notify_order_status_change(user_id: int, order_id: int, new_status: str) -> None:
@@ -1,7 +1,6 @@
 from services.notifications import notify_order_status_change, notify_new_order
 import pandas as pd
-import psycopg2
-from settings import DB_CONFIG
+from repositories.connection import get_connection
 import logging
 from datetime import datetime
 from services.order_status import PENDING, ALL_STATUSES
@@ -11,39 +10,99 @@ logger = logging.getLogger(__name__)
 def get_all_orders():
     """Получить все заказы"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
         query = """
         SELECT o.order_id, o.user_id, u.email, o.order_date, o.status
         FROM orders o
         JOIN users u ON o.user_id = u.user_id
         ORDER BY o.order_date DESC
         """
-        orders_df = pd.read_sql_query(query, conn)
-        conn.close()
+        with get_connection() as conn:
+            orders_df = pd.read_sql_query(query, conn)
         return orders_df
     except Exception as e:
         logger.error(f"Error getting orders: {e}")
         raise
 
+def _orders_filter(status: str = None, user_id: int = None) -> tuple[list, list]:
+    """Условия и параметры WHERE для фильтрации заказов по статусу и пользователю"""
+    conditions = []
+    params = []
+    if status:
+        conditions.append("o.status = %s")
+        params.append(status)
+    if user_id is not None:
+        conditions.append("o.user_id = %s")
+        params.append(user_id)
+    return conditions, params
+
+def get_orders_page(limit: int = 20, after: tuple = None, status: str = None, user_id: int = None):
+    """
+    Получить страницу заказов, отсортированных по (order_date, order_id) по убыванию.
+    Страницы выбираются по ключу последнего заказа, а не через OFFSET,
+    поэтому стоимость запроса не зависит от номера страницы.
+    :param limit: количество заказов на странице
+    :param after: ключ (order_date, order_id) последнего заказа предыдущей страницы; None - первая страница
+    :param status: фильтр по статусу
+    :param user_id: фильтр по пользователю
+    :return: (DataFrame заказов, ключ для следующей страницы или None, если страница последняя)
+    """
+    try:
+        conditions, params = _orders_filter(status, user_id)
+        if after is not None:
+            conditions.append("(o.order_date, o.order_id) < (%s, %s)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+        SELECT o.order_id, o.user_id, u.email, o.order_date, o.status
+        FROM orders o
+        JOIN users u ON o.user_id = u.user_id
+        {where}
+        ORDER BY o.order_date DESC, o.order_id DESC
+        LIMIT %s
+        """
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        params.append(limit + 1)
+        with get_connection() as conn:
+            orders_df = pd.read_sql_query(query, conn, params=tuple(params))
+
+        next_cursor = None
+        if len(orders_df) > limit:
+            orders_df = orders_df.iloc[:limit]
+            last_order = orders_df.iloc[-1]
+            next_cursor = (pd.Timestamp(last_order['order_date']).to_pydatetime(), int(last_order['order_id']))
+        return orders_df, next_cursor
+    except Exception as e:
+        logger.error(f"Error getting orders page: {e}")
+        raise
+
+def estimate_orders_count(status: str = None, user_id: int = None) -> int:
+    """Приблизительное количество заказов по оценке планировщика, без COUNT(*) по всей таблице"""
+    try:
+        conditions, params = _orders_filter(status, user_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"EXPLAIN (FORMAT JSON) SELECT 1 FROM orders o {where}"
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, tuple(params))
+                return int(cursor.fetchone()[0][0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.error(f"Error estimating orders count: {e}")
+        raise
+
 def update_order_status(order_id: int, new_status: str):
     """Обновить статус заказа"""
     try:
         if new_status not in ALL_STATUSES:
             raise ValueError(f"Invalid status: {new_status}. Must be one of {ALL_STATUSES}")
             
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
         query = """
         UPDATE orders
         SET status = %s
         WHERE order_id = %s
         """
-        cursor.execute(query, (new_status, order_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (new_status, order_id))
         
         logger.info(f"Order {order_id} status updated to {new_status}")
     except Exception as e:
@@ -53,15 +112,14 @@ def update_order_status(order_id: int, new_status: str):
 def get_user_orders(user_id: int):
     """Получить заказы пользователя"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
         query = """
         SELECT order_id, order_date, status
         FROM orders
         WHERE user_id = %s
         ORDER BY order_date DESC
         """
-        orders_df = pd.read_sql_query(query, conn, params=(user_id,))
-        conn.close()
+        with get_connection() as conn:
+            orders_df = pd.read_sql_query(query, conn, params=(user_id,))
         return orders_df
     except Exception as e:
         logger.error(f"Error getting user orders: {e}")
@@ -70,21 +128,16 @@ def get_user_orders(user_id: int):
 def create_order(user_id: int, total_amount: float) -> int:
     """Создать новый заказ"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
         # Создаем заказ с английским статусом
         query = """
         INSERT INTO orders (user_id, order_date, status)
         VALUES (%s, %s, %s)
         RETURNING order_id
         """
-        cursor.execute(query, (user_id, datetime.now(), PENDING))
-        order_id = cursor.fetchone()[0]
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (user_id, datetime.now(), PENDING))
+                order_id = cursor.fetchone()[0]
         
         logger.info(f"Created new order {order_id} for user {user_id}")
         return order_id
@@ -0,0 +1,144 @@
+"""
+Хеширование и проверка паролей bcrypt в пуле процессов.
+
+bcrypt занимает процессор на 100-300 мс; в пуле процессов эта работа не блокирует поток сервера
+и распределяется по ядрам. Число одновременно принятых задач ограничено: сверх
+PASSWORD_POOL_WORKERS + PASSWORD_POOL_MAX_PENDING новые задачи сразу отклоняются
+с PasswordPoolBusy, чтобы всплеск входов не занял сервер целиком.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import passw
+from settings import PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPoolBusy(RuntimeError):
+    """Очередь пула паролей заполнена; запрос нужно повторить позже"""
+
+
+def _check_password(password: str, password_hash: str) -> bool:
+    # Выполняется в процессе пула
+    try:
+        return passw.verify_password(password, password_hash)
+    except Exception as e:
+        print(f"Error checking password: {e}")
+        return False
+
+
+class PasswordHasher:
+    """
+    Асинхронный интерфейс к пулу процессов bcrypt
+    :param workers: число процессов; 0 - по числу ядер
+    :param max_pending: сколько задач может ждать свободного процесса
+    """
+
+    def __init__(self, workers: int = PASSWORD_POOL_WORKERS, max_pending: int = PASSWORD_POOL_MAX_PENDING):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._metrics = {
+            "completed": 0, "failed": 0, "cancelled": 0, "rejected": 0, "max_queue_depth": 0, "total_time": 0.0,
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: в процессе сервера работают фоновые потоки, fork их состояние не переносит
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                    logger.info(f"Started password pool with {self.workers} workers")
+        return self._executor
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_pending:
+                self._metrics["rejected"] += 1
+                raise PasswordPoolBusy(f"Password pool is busy: {self._in_flight} tasks in flight")
+            self._in_flight += 1
+            queue_depth = max(0, self._in_flight - self.workers)
+            self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], queue_depth)
+
+        started = time.perf_counter()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+                self._metrics["failed"] += 1
+            raise
+        # Место освобождается, когда задача завершилась в пуле, а не когда ожидавший ее запрос отменен:
+        # отмененный запрос не останавливает уже запущенный bcrypt
+        future.add_done_callback(lambda done: self._finish(done, started))
+        return await asyncio.wrap_future(future)
+
+    def _finish(self, future, started: float) -> None:
+        # Вызывается потоком пула по завершении задачи
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                self._metrics["cancelled"] += 1
+            elif future.exception() is not None:
+                self._metrics["failed"] += 1
+            else:
+                self._metrics["completed"] += 1
+                self._metrics["total_time"] += time.perf_counter() - started
+
+    async def hash(self, password: str) -> str:
+        """Хеш пароля bcrypt"""
+        return await self._run(passw.hash_password, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        """Проверка пароля по хешу; некорректный хеш считается несовпадением"""
+        return await self._run(_check_password, password, password_hash)
+
+    def stats(self) -> dict:
+        """
+        Текущая загрузка пула: задачи в работе, глубина очереди и счетчики
+        (completed - успешные задачи, avg_time_ms считается по ним)
+        """
+        with self._lock:
+            completed = self._metrics["completed"]
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.workers),
+                "max_queue_depth": self._metrics["max_queue_depth"],
+                "completed": completed,
+                "failed": self._metrics["failed"],
+                "cancelled": self._metrics["cancelled"],
+                "rejected": self._metrics["rejected"],
+                "avg_time_ms": self._metrics["total_time"] / completed * 1000 if completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_password_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Общий для процесса пул паролей"""
+    global _password_hasher
+    if _password_hasher is None:
+        with _hasher_lock:
+            if _password_hasher is None:
+                _password_hasher = PasswordHasher()
+    return _password_hasher
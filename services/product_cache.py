@@ -0,0 +1,103 @@
+"""
+Схема записей кеша продуктов в Redis.
+
+Краткая запись (summary) - элемент снимка каталога: id и название продукта.
+Детальная запись (detail) - полная информация о продукте для страницы товара.
+Записи хранятся под разными ключами, поэтому обновление каталога не затрагивает детальные записи.
+Оба вида записей хранятся через serializer RedisService с тегами SUMMARY_SCHEMA и DETAIL_SCHEMA.
+
+Версия схемы входит в ключи и теги: при изменении состава или типов полей увеличьте
+PRODUCT_CACHE_VERSION, и записи старой версии просто перестанут читаться и истекут по TTL.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_CACHE_VERSION = 3
+
+SUMMARY_SCHEMA = f"product.summary.v{PRODUCT_CACHE_VERSION}"
+DETAIL_SCHEMA = f"product.detail.v{PRODUCT_CACHE_VERSION}"
+
+# Поле -> (тип, обязательное).
+# Необязательные поля со значением None не записываются и при чтении возвращаются как None.
+PRODUCT_SUMMARY_SCHEMA = {
+    'product_id': (int, True),
+    'name': (str, True),
+}
+
+PRODUCT_DETAIL_SCHEMA = {
+    'product_id': (int, True),
+    'product_name': (str, True),
+    'price': (float, True),
+    'description': (str, False),
+    'warranty_period': (int, False),
+    'stock_quantity': (int, True),
+    'manufacturer_id': (int, False),
+    'manufacturer_name': (str, False),
+    'manufacturer_country': (str, False),
+    'reviews': (list, True),
+}
+
+
+def catalog_key() -> str:
+    """Ключ снимка каталога (список кратких записей)"""
+    return f"products:v{PRODUCT_CACHE_VERSION}:catalog"
+
+
+def detail_key(product_id: int) -> str:
+    """Ключ детальной записи продукта"""
+    return f"product:v{PRODUCT_CACHE_VERSION}:{int(product_id)}:detail"
+
+
+def encode_summary(product: dict) -> dict:
+    """
+    Краткая запись продукта для снимка каталога
+    :param product: строка из БД, содержащая как минимум product_id и name
+    """
+    return {field: field_type(product[field]) for field, (field_type, _) in PRODUCT_SUMMARY_SCHEMA.items()}
+
+
+def encode_detail(product_details: dict) -> dict:
+    """
+    Детальная запись продукта с приведенными к схеме типами
+    :param product_details: строка из БД (get_product_details_by_ids)
+    """
+    record = {}
+    for field, (field_type, required) in PRODUCT_DETAIL_SCHEMA.items():
+        value = product_details.get(field)
+        if value is None:
+            if required:
+                raise ValueError(f"Product {product_details.get('product_id')} has no value for required field {field}")
+            continue
+        record[field] = list(value) if field_type is list else field_type(value)
+    return record
+
+
+def decode_detail(product_id: int, record: dict) -> dict | None:
+    """
+    Детальная запись продукта из кеша
+    :return: словарь с деталями или None, если записи нет или она не соответствует схеме
+    """
+    if not record:
+        return None
+
+    product_details = {}
+    for field, (field_type, required) in PRODUCT_DETAIL_SCHEMA.items():
+        value = record.get(field)
+        if value is None:
+            if required:
+                logger.warning(f"Missing field {field} in cache for product {product_id}")
+                return None
+            product_details[field] = None
+        elif field_type is list:
+            if not isinstance(value, list):
+                logger.warning(f"Field {field} in cache for product {product_id} is not a list")
+                return None
+            product_details[field] = value
+        else:
+            try:
+                product_details[field] = field_type(value)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Could not decode field {field} in cache for product {product_id}: {e}")
+                return None
+    return product_details
@@ -1,15 +1,50 @@
 from pandas import DataFrame
 import repositories.products
 import pandas as pd
-from services.redis_service import RedisService
-import json
+from services.redis_service import get_redis_service
+from services import product_cache
 import logging
+import math
+import random
+import time
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-redis_service = RedisService()
+redis_service = get_redis_service()
+
+PRODUCT_CACHE_TTL = 3600
+
+# Защита от одновременной перезагрузки одного продукта (single-flight):
+# время жизни блокировки, максимальное ожидание чужой загрузки и интервал опроса кеша
+PRODUCT_LOCK_TTL_MS = 5000
+PRODUCT_LOCK_WAIT = 3.0
+PRODUCT_LOCK_POLL_INTERVAL = 0.05
+
+# Коэффициент вероятностного раннего обновления (больше - обновлять раньше)
+PRODUCT_EARLY_REFRESH_BETA = 1.0
+
+# Порог низкого количества товара на складе
+LOW_STOCK_THRESHOLD = 5
+
+# Минимальное сходство названия с запросом (word_similarity pg_trgm, от 0 до 1)
+SEARCH_SIMILARITY_THRESHOLD = 0.3
+
+# Результаты поиска и фильтрации кешируются надолго: их сбрасывает инвалидация тегов
+SEARCH_CACHE_TTL = 3600
+FILTER_CACHE_TTL = 3600
+
+# Тег результатов, в которые может попасть любой новый продукт
+CATALOG_TAG = "catalog"
+
+
+def _product_tag(product_id: int) -> str:
+    return f"product:{int(product_id)}"
+
+
+def _manufacturer_tag(manufacturer_id: int) -> str:
+    return f"manufacturer:{manufacturer_id}"
 
 def fetch_product_names_and_ids() -> pd.DataFrame:
     try:
@@ -37,105 +72,270 @@ def fetch_product_names_and_ids() -> pd.DataFrame:
         logger.error(f"Error while fetching products: {e}")
         raise
 
+def search_products(search_query: str, limit: int = 10) -> pd.DataFrame:
+    """
+    Нечеткий поиск товаров по названию на стороне БД (триграммный индекс).
+    :param search_query: строка поиска.
+    :param limit: максимальное количество результатов.
+    :return: DataFrame с колонками product_id, name, score по убыванию score.
+    """
+    try:
+        products = repositories.products.search_products_by_name(
+            search_query.strip(), limit, SEARCH_SIMILARITY_THRESHOLD
+        )
+        logger.info(f"Found {len(products)} products for query: {search_query}")
+        if not products:
+            return pd.DataFrame(columns=["product_id", "name", "score"])
+        return pd.DataFrame(products)
+    except Exception as e:
+        logger.error(f"Error while searching products: {e}")
+        raise
+
+
+def _pop_cache_meta(cached_product: dict) -> tuple[float, float] | None:
+    """
+    Извлекает из записи продукта служебные поля раннего обновления.
+    :return: (время загрузки из БД в секундах, момент истечения записи) или None для старых записей.
+    """
+    delta = cached_product.pop('cache_delta', None)
+    expires_at = cached_product.pop('cache_expires_at', None)
+    if delta is None or expires_at is None:
+        return None
+    try:
+        return float(delta), float(expires_at)
+    except (ValueError, TypeError):
+        return None
+
+
+def _decode_cached_record(product_id: int, raw) -> tuple[dict | None, tuple[float, float] | None]:
+    """
+    Декодирует значение детальной записи, прочитанное из Redis.
+    :return: (детали или None при промахе, служебные поля раннего обновления)
+    """
+    record = redis_service.load_value(raw, product_cache.DETAIL_SCHEMA)
+    if not isinstance(record, dict):
+        return None, None
+    cache_meta = _pop_cache_meta(record)
+    return product_cache.decode_detail(product_id, record), cache_meta
+
+
+def _should_refresh_early(cache_meta: tuple[float, float] | None) -> bool:
+    """
+    Вероятностное раннее обновление (XFetch): чем ближе истечение записи и чем дороже
+    ее загрузка, тем выше вероятность, что этот запрос перезагрузит ее заранее.
+    """
+    if cache_meta is None:
+        return False
+    delta, expires_at = cache_meta
+    return time.time() - delta * PRODUCT_EARLY_REFRESH_BETA * math.log(1.0 - random.random()) >= expires_at
+
+
+def _cache_product_details(pipe, product_details: dict, delta: float = 0.0) -> None:
+    """
+    Добавляет в pipeline детальную запись продукта в кеш
+    :param delta: время загрузки деталей из БД, используется для раннего обновления
+    """
+    record = product_cache.encode_detail(product_details)
+    record['cache_delta'] = delta
+    record['cache_expires_at'] = time.time() + PRODUCT_CACHE_TTL
+    pipe.set(
+        product_cache.detail_key(product_details['product_id']),
+        redis_service.dump_value(record, product_cache.DETAIL_SCHEMA),
+        ex=PRODUCT_CACHE_TTL,
+    )
+
+
+def _load_product_details_from_db(product_ids: list[int], generation: int) -> dict[int, dict]:
+    """Загружает детали из БД одним запросом и записывает их в Redis и локальный кеш"""
+    logger.info(f"Getting details for products {product_ids} from database")
+    started = time.monotonic()
+    rows = repositories.products.get_product_details_by_ids(product_ids)
+    delta = time.monotonic() - started
+
+    loaded = {}
+    pipe = redis_service.binary_client.pipeline(transaction=False)
+    for product_details in rows:
+        _cache_product_details(pipe, product_details, delta)
+        loaded[product_details['product_id']] = product_details
+        redis_service.set_local(product_cache.detail_key(product_details['product_id']), product_details,
+                                generation=generation)
+    pipe.execute()
+    return loaded
+
+
+def _wait_for_product_details(product_ids: list[int], generation: int) -> dict[int, dict]:
+    """
+    Ждет, пока другой процесс, взявший блокировку, загрузит детали в Redis.
+    Если блокировка снята без результата (продукта нет в БД) или за PRODUCT_LOCK_WAIT
+    детали так и не появились, загружает их из БД сам.
+    """
+    loaded = {}
+    pending = list(product_ids)
+    unresolved = []
+    deadline = time.monotonic() + PRODUCT_LOCK_WAIT
+    while pending and time.monotonic() < deadline:
+        time.sleep(PRODUCT_LOCK_POLL_INTERVAL)
+        pipe = redis_service.binary_client.pipeline(transaction=False)
+        for pid in pending:
+            pipe.get(product_cache.detail_key(pid))
+            pipe.exists(f"lock:product:{pid}")
+        results = pipe.execute()
+        for pid, raw, locked in zip(list(pending), results[::2], results[1::2]):
+            product_details, _ = _decode_cached_record(pid, raw)
+            if product_details is not None:
+                loaded[pid] = product_details
+                pending.remove(pid)
+                redis_service.set_local(product_cache.detail_key(pid), product_details, generation=generation)
+            elif not locked:
+                unresolved.append(pid)
+                pending.remove(pid)
+
+    if pending:
+        logger.warning(f"Timed out waiting for products {pending} to be cached, loading them directly")
+    if pending or unresolved:
+        loaded.update(_load_product_details_from_db(pending + unresolved, generation))
+    return loaded
+
+
+def _load_product_details(misses: list[int], stale: list[int], generation: int) -> dict[int, dict]:
+    """
+    Загружает детали продуктов так, чтобы каждый продукт перезагружал из БД только один запрос.
+    :param misses: продукты, которых нет в кеше; без блокировки ждем чужую загрузку.
+    :param stale: продукты, выбранные для раннего обновления; без блокировки остается значение из кеша.
+    :return: словарь {product_id: детали} для загруженных продуктов.
+    """
+    tokens = redis_service.acquire_locks([f"product:{pid}" for pid in misses + stale], PRODUCT_LOCK_TTL_MS)
+    owned = [pid for pid in misses + stale if f"product:{pid}" in tokens]
+    loaded = {}
+    try:
+        if owned:
+            loaded = _load_product_details_from_db(owned, generation)
+    finally:
+        redis_service.release_locks(tokens)
+
+    waiting = [pid for pid in misses if f"product:{pid}" not in tokens]
+    if waiting:
+        logger.info(f"Products {waiting} are being loaded by another worker, waiting")
+        loaded.update(_wait_for_product_details(waiting, generation))
+    return loaded
+
+
+def fetch_product_details_by_ids(product_ids: list[int]) -> dict[int, dict]:
+    """
+    Получает информацию сразу о нескольких продуктах: один pipeline в Redis
+    и один запрос в БД для продуктов, которых нет в кеше.
+    Промах по популярному продукту перезагружает из БД только один запрос, остальные ждут результат.
+    :param product_ids: список id продуктов.
+    :return: словарь {product_id: детали} в порядке входного списка; ненайденные продукты пропускаются.
+    """
+    try:
+        ids = list(dict.fromkeys(int(pid) for pid in product_ids))
+        if not ids:
+            return {}
+
+        # Сначала локальный кеш процесса, затем Redis, затем БД
+        found = {}
+        for pid in ids:
+            product_details = redis_service.get_local(product_cache.detail_key(pid))
+            if product_details is not None:
+                found[pid] = product_details
+        remote_ids = [pid for pid in ids if pid not in found]
+
+        if remote_ids:
+            generation = redis_service.local_cache.generation
+            pipe = redis_service.binary_client.pipeline(transaction=False)
+            for pid in remote_ids:
+                pipe.get(product_cache.detail_key(pid))
+            cached_products = pipe.execute()
+
+            misses = []
+            stale = []
+            for pid, raw in zip(remote_ids, cached_products):
+                product_details, cache_meta = _decode_cached_record(pid, raw)
+                if product_details is None:
+                    misses.append(pid)
+                    continue
+                found[pid] = product_details
+                if _should_refresh_early(cache_meta):
+                    stale.append(pid)
+                else:
+                    redis_service.set_local(product_cache.detail_key(pid), product_details, generation=generation)
+            logger.info(f"Retrieved {len(remote_ids) - len(misses)} of {len(remote_ids)} products from Redis")
+
+            if misses or stale:
+                found.update(_load_product_details(misses, stale, generation))
+
+                not_found = [pid for pid in misses if pid not in found]
+                if not_found:
+                    logger.warning(f"No products found for IDs: {not_found}")
+
+        # Записи локального кеша общие для всех вызовов, поэтому отдаем копии
+        return {pid: dict(found[pid]) for pid in ids if pid in found}
+    except Exception as e:
+        logger.error(f"Error while fetching product details: {e}")
+        raise
+
+
+def invalidate_product_details(product_ids: list[int]) -> None:
+    """
+    Удаляет детали продуктов из Redis и из локального кеша всех процессов
+    и инвалидирует закешированные результаты поиска и фильтрации, в которые они входят.
+    :param product_ids: список id продуктов.
+    """
+    try:
+        if not product_ids:
+            return
+        keys = [product_cache.detail_key(pid) for pid in product_ids]
+        redis_service.binary_client.delete(*keys)
+        redis_service.invalidate_local(keys=keys)
+        redis_service.invalidate_tags([_product_tag(pid) for pid in product_ids])
+    except Exception as e:
+        logger.error(f"Error while invalidating products {product_ids} cache: {e}")
+        raise
+
+
 def fetch_product_details_by_id(product_id: int) -> dict:
     """
     Получает всю информацию о продукте по его id
     :param product_id: id продукта для которого мы запрашиваем информацию.
     :return: словарь которых хранит детализированную информацию.
     """
+    return fetch_product_details_by_ids([product_id]).get(int(product_id), {})
+
+
+def search_products_with_details(search_query: str, limit: int = 10) -> list[dict]:
+    """
+    Поиск товаров по названию с полной информацией о найденных товарах.
+    Результат кешируется с тегами найденных товаров и каталога и сбрасывается при их изменении.
+    :param search_query: строка поиска.
+    :param limit: максимальное количество результатов.
+    :return: список словарей с деталями товаров (с полем name) по убыванию сходства.
+    """
     try:
-        # Try to get from cache first
-        cached_product = redis_service.redis_client.hgetall(f"product:{product_id}")
-        
-        # Check if we have all required fields
-        required_fields = ['product_id', 'name', 'price', 'description', 
-                         'warranty_period', 'stock_quantity', 'manufacturer_id']
-        
-        if cached_product:
-            logger.info(f"Retrieved product {product_id} from cache")
-            # Check if all required fields are present
-            missing_fields = [field for field in required_fields if field not in cached_product]
-            if missing_fields:
-                logger.warning(f"Missing fields in cache: {missing_fields}")
-                # Get fresh data from DB
-                product_details = repositories.products.get_product_details_by_id(product_id)
-                if product_details:
-                    # Convert reviews to string before caching
-                    if 'reviews' in product_details:
-                        product_details['reviews'] = json.dumps(product_details['reviews'])
-                    # Update cache with fresh data
-                    redis_service.redis_client.hset(f"product:{product_id}", mapping=product_details)
-                    redis_service.redis_client.expire(f"product:{product_id}", 3600)
-                    # Convert reviews back to list before returning
-                    if 'reviews' in product_details:
-                        product_details['reviews'] = json.loads(product_details['reviews'])
-                    return product_details
-                return {}
-            
-            # Convert numeric strings back to numbers
-            numeric_fields = {
-                'price': float,
-                'stock_quantity': int,
-                'warranty_period': int,
-                'product_id': int,
-                'manufacturer_id': int
-            }
-            
-            for field, converter in numeric_fields.items():
-                if field in cached_product:
-                    try:
-                        cached_product[field] = converter(cached_product[field])
-                    except (ValueError, TypeError) as e:
-                        logger.warning(f"Could not convert {field} to {converter.__name__}: {e}")
-                        # If conversion fails, get fresh data from DB
-                        product_details = repositories.products.get_product_details_by_id(product_id)
-                        if product_details:
-                            # Convert reviews to string before caching
-                            if 'reviews' in product_details:
-                                product_details['reviews'] = json.dumps(product_details['reviews'])
-                            # Update cache with fresh data
-                            redis_service.redis_client.hset(f"product:{product_id}", mapping=product_details)
-                            redis_service.redis_client.expire(f"product:{product_id}", 3600)
-                            # Convert reviews back to list before returning
-                            if 'reviews' in product_details:
-                                product_details['reviews'] = json.loads(product_details['reviews'])
-                            return product_details
-                        continue
-            
-            # Convert reviews from string back to list if present
-            if 'reviews' in cached_product:
-                try:
-                    cached_product['reviews'] = json.loads(cached_product['reviews'])
-                except json.JSONDecodeError:
-                    logger.warning("Could not parse reviews JSON")
-                    cached_product['reviews'] = []
-            
-            return cached_product
-        
-        # If not in cache, get from database
-        logger.info(f"Getting product {product_id} details from database")
-        product_details = repositories.products.get_product_details_by_id(product_id)
-        
-        if not product_details:
-            logger.warning(f"No product found for ID: {product_id}")
-            return {}
-        
-        # Convert reviews to string before caching
-        if 'reviews' in product_details:
-            product_details['reviews'] = json.dumps(product_details['reviews'])
-            
-        # Cache the result
-        redis_service.redis_client.hset(f"product:{product_id}", mapping=product_details)
-        redis_service.redis_client.expire(f"product:{product_id}", 3600)  # Cache for 1 hour
-        
-        # Convert reviews back to list before returning
-        if 'reviews' in product_details:
-            product_details['reviews'] = json.loads(product_details['reviews'])
-        
-        logger.info(f"Received product details for ID: {product_id}")
-        return product_details
+        # pg_trgm не различает регистр и лишние пробелы, поэтому и ключ кеша их не различает
+        normalized_query = " ".join(search_query.lower().split())
+        search_cache_key = f"search:{limit}:{normalized_query}"
+        cached_results = redis_service.get_tagged_data(search_cache_key)
+        if cached_results is not None:
+            logger.info(f"Found cached search results for query: {search_query}")
+            return cached_results
+
+        # Поколения тегов читаются до запроса: изменение каталога во время него не даст закешировать устаревший результат
+        generations = redis_service.snapshot_tags([CATALOG_TAG])
+        matches = search_products(normalized_query, limit)
+        details_by_id = fetch_product_details_by_ids(matches['product_id'].tolist())
+        results = []
+        for product_id, name in zip(matches['product_id'], matches['name']):
+            product_details = details_by_id.get(int(product_id))
+            if product_details:
+                product_details['name'] = name
+                results.append(product_details)
+
+        tags = [CATALOG_TAG] + [_product_tag(product['product_id']) for product in results]
+        redis_service.cache_tagged_data(search_cache_key, results, tags, SEARCH_CACHE_TTL, generations)
+        return results
     except Exception as e:
-        logger.error(f"Error while fetching product details: {e}")
+        logger.error(f"Error while searching products with details: {e}")
         raise
 
 
@@ -149,6 +349,16 @@ def add_product_to_user_cart(user_id: int, product_id: int, quantity: int) -> No
     """
     try:
         repositories.products.add_product_to_cart(user_id, product_id, quantity)
+        # Корзина в Redis обновляется вслед за БД; при ошибке удаляется и перечитывается из БД
+        try:
+            price = fetch_product_details_by_id(product_id)['price']
+            redis_service.cart_add_item(user_id, product_id, quantity, price)
+        except Exception as e:
+            logger.error(f"Failed to update cached cart for user {user_id}, dropping it: {e}")
+            try:
+                redis_service.delete_cart(user_id)
+            except Exception:
+                pass
         logger.info("Product added to cart successfully.")
     except Exception as e:
         logger.error(f"Error in add_product_to_user_cart: {e}")
@@ -171,6 +381,37 @@ def check_product_stock(product_id: int) -> int:
         logger.error(f"Unexpected error while checking stock for product ID {product_id}: {e}")
         raise
 
+def check_products_stock(product_ids: list[int] = None) -> dict[int, int]:
+    """
+    Проверяет остатки на складе сразу для нескольких продуктов одним запросом.
+
+    :param product_ids: список ID продуктов; None - все продукты.
+    :return: словарь {product_id: количество на складе}.
+    """
+    try:
+        rows = repositories.products.get_products_stock(product_ids)
+        return {row['product_id']: row['stock_quantity'] for row in rows}
+    except Exception as e:
+        logger.error(f"Unexpected error while checking stock for products {product_ids}: {e}")
+        raise
+
+def fetch_low_stock_products(threshold: int = LOW_STOCK_THRESHOLD) -> pd.DataFrame:
+    """
+    Получает товары, количество которых на складе не превышает порог.
+
+    :param threshold: порог низкого количества.
+    :return: DataFrame с колонками product_id, name, stock_quantity.
+    """
+    try:
+        products = repositories.products.get_low_stock_products(threshold)
+        logger.info(f"Found {len(products)} products with stock <= {threshold}")
+        if not products:
+            return pd.DataFrame(columns=["product_id", "name", "stock_quantity"])
+        return pd.DataFrame(products)
+    except Exception as e:
+        logger.error(f"Error while fetching low stock products: {e}")
+        raise
+
 def reduce_product_stock(product_id: int, quantity: int) -> None:
     """
     Обертка для функции decrease_product_stock. Уменьшает количество товара на складе.
@@ -180,6 +421,7 @@ def reduce_product_stock(product_id: int, quantity: int) -> None:
     """
     try:
         repositories.products.decrease_product_stock(product_id, quantity)
+        invalidate_product_details([product_id])
         logger.info(f"Successfully decreased stock for product ID {product_id} by {quantity}.")
     except ValueError as e:
         logger.error(f"Stock decrease error: {e}")
@@ -202,49 +444,63 @@ def add_new_product(name: str, price: float, description: str, warranty_period:
     """
     try:
         product_id = repositories.products.add_new_product(name, price, description, warranty_period, manufacturer_id, stock_quantity)
+        redis_service.invalidate_products()
+        # Новый продукт может попасть в любой результат поиска и в фильтры по своему производителю
+        redis_service.invalidate_tags([CATALOG_TAG, _manufacturer_tag(manufacturer_id)])
         logger.info(f"Product '{name}' added successfully with ID: {product_id}.")
         return product_id
     except Exception as e:
         logger.error(f"Error while adding new product: {e}")
         raise
 
-def filter_products(category: str = None, min_price: float = None, max_price: float = None) -> pd.DataFrame:
+def _filter_cache_key(manufacturer_id: int, min_price: float, max_price: float,
+                      sort_by: str, descending: bool, limit: int) -> str:
+    """
+    Нормализованный ключ кеша фильтра: одинаковые по смыслу параметры
+    (10 и 10.0, "5" и 5) дают один и тот же ключ.
+    """
+    def _price(value):
+        return "" if value is None else repr(float(value))
+
+    manufacturer = "" if manufacturer_id is None else str(int(manufacturer_id))
+    order = "desc" if descending else "asc"
+    return f"filter:m={manufacturer}:min={_price(min_price)}:max={_price(max_price)}:sort={sort_by}.{order}:limit={int(limit)}"
+
+
+def filter_products(manufacturer_id: int = None, min_price: float = None, max_price: float = None,
+                    sort_by: str = "price", descending: bool = False, limit: int = 50) -> pd.DataFrame:
     """
-    Фильтрация товаров по параметрам
-    :param category: Категория товара
+    Фильтрация товаров по параметрам одним индексированным запросом к БД
+    :param manufacturer_id: ID производителя
     :param min_price: Минимальная цена
     :param max_price: Максимальная цена
-    :return: DataFrame с отфильтрованными товарами
+    :param sort_by: Поле сортировки (price, name, stock_quantity, product_id)
+    :param descending: Сортировка по убыванию
+    :param limit: Максимальное количество товаров
+    :return: DataFrame с колонками product_id, name, price, stock_quantity, manufacturer_id
     """
     try:
-        # Создаем ключ для кеширования на основе параметров фильтрации
-        filter_key = f"filter:{category}:{min_price}:{max_price}"
-        
-        # Проверяем кеш
-        cached_result = redis_service.get_temporary_data(filter_key)
-        if cached_result:
+        filter_key = _filter_cache_key(manufacturer_id, min_price, max_price, sort_by, descending, limit)
+
+        # Проверяем кеш (пустой результат тоже кешируется)
+        cached_result = redis_service.get_tagged_data(filter_key)
+        if cached_result is not None:
             logger.info("Получены отфильтрованные товары из кеша")
-            return pd.DataFrame(cached_result)
-        
-        # Получаем все товары
-        products = repositories.products.get_products_names_id()
-        
-        # Применяем фильтры
-        filtered_products = []
-        for product in products:
-            if category and product.get('category') != category:
-                continue
-            if min_price and product.get('price', 0) < min_price:
-                continue
-            if max_price and product.get('price', 0) > max_price:
-                continue
-            filtered_products.append(product)
-        
-        # Кешируем результат
-        redis_service.cache_temporary_data(filter_key, filtered_products)
-        
+            filtered_products = cached_result
+        else:
+            # Фильтр по производителю зависит только от его товаров, остальные - от всего каталога
+            scope_tag = CATALOG_TAG if manufacturer_id is None else _manufacturer_tag(int(manufacturer_id))
+            generations = redis_service.snapshot_tags([scope_tag])
+            filtered_products = repositories.products.filter_products(
+                manufacturer_id, min_price, max_price, sort_by, descending, limit
+            )
+            tags = [scope_tag] + [_product_tag(product['product_id']) for product in filtered_products]
+            redis_service.cache_tagged_data(filter_key, filtered_products, tags, FILTER_CACHE_TTL, generations)
+
         logger.info(f"Отфильтровано {len(filtered_products)} товаров")
+        if not filtered_products:
+            return pd.DataFrame(columns=["product_id", "name", "price", "stock_quantity", "manufacturer_id"])
         return pd.DataFrame(filtered_products)
     except Exception as e:
         logger.error(f"Ошибка при фильтрации товаров: {e}")
-        raise
\ No newline at end of file
+        raise
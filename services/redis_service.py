@@ -1,41 +1,505 @@
 import redis
 import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import timedelta, datetime, timezone
-from settings import REDIS_CONFIG
+from settings import REDIS_CONFIG, LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_TTL
 import logging
-from repositories import products
+from services import product_cache
+from services.serialization import get_serializer, SerializationError
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Каналы, на которые подписывается PubSub сервиса
+NOTIFICATION_CHANNELS = ("order_status_changed", "admin_notifications")
+
+# Снимает блокировку, только если она все еще принадлежит владельцу токена
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Возвращает значение из hash тегированного результата, только если поколения всех его тегов
+# не изменились с момента записи; устаревший результат удаляется
+GET_TAGGED_SCRIPT = """
+local fields = redis.call('HGETALL', KEYS[1])
+if #fields == 0 then
+    return false
+end
+local data = false
+for i = 1, #fields, 2 do
+    local field = fields[i]
+    if field == 'data' then
+        data = fields[i + 1]
+    elseif string.sub(field, 1, 4) == 'tag:' then
+        local current = redis.call('GET', field .. ':gen') or '0'
+        if current ~= fields[i + 1] then
+            redis.call('DEL', KEYS[1])
+            return false
+        end
+    end
+end
+return data
+"""
+
+# Записывает тегированный результат с текущими поколениями его тегов. Если передан снимок
+# (пары ключ поколения - значение, прочитанные до запроса к БД) и с тех пор какой-то из этих
+# ключей изменился, результат мог устареть во время запроса: запись пропускается, возвращается 0
+CACHE_TAGGED_SCRIPT = """
+local snapshot_size = tonumber(ARGV[3])
+for i = 4, 3 + snapshot_size * 2, 2 do
+    if (redis.call('GET', ARGV[i]) or '0') ~= ARGV[i + 1] then
+        return 0
+    end
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'data', ARGV[2])
+for i = 4 + snapshot_size * 2, #ARGV do
+    redis.call('HSET', KEYS[1], 'tag:' .. ARGV[i], redis.call('GET', 'tag:' .. ARGV[i] .. ':gen') or '0')
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Версия корзины (KEYS[2]) увеличивается при каждом изменении, даже если корзины нет в кеше:
+# по ней load_cart видит, что корзина менялась, пока ее читали из БД
+
+# Добавление товара в hash корзины (если корзина есть в кеше): количество, цена, дата и итоги
+CART_ADD_ITEM_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local product_id = ARGV[1]
+local quantity = tonumber(ARGV[2])
+redis.call('HINCRBY', KEYS[1], 'qty:' .. product_id, quantity)
+redis.call('HSETNX', KEYS[1], 'price:' .. product_id, ARGV[3])
+redis.call('HSETNX', KEYS[1], 'added:' .. product_id, ARGV[4])
+local price = tonumber(redis.call('HGET', KEYS[1], 'price:' .. product_id))
+redis.call('HINCRBY', KEYS[1], 'total_quantity', quantity)
+redis.call('HINCRBYFLOAT', KEYS[1], 'total_price', quantity * price)
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return 1
+"""
+
+# Новое количество товара в hash корзины (0 - удалить товар) с пересчетом итогов
+CART_SET_QUANTITY_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local product_id = ARGV[1]
+local quantity = math.max(tonumber(ARGV[2]), 0)
+local old_quantity = tonumber(redis.call('HGET', KEYS[1], 'qty:' .. product_id) or '0')
+if old_quantity == 0 then
+    return 1
+end
+local price = tonumber(redis.call('HGET', KEYS[1], 'price:' .. product_id) or '0')
+if quantity == 0 then
+    redis.call('HDEL', KEYS[1], 'qty:' .. product_id, 'price:' .. product_id, 'added:' .. product_id)
+else
+    redis.call('HSET', KEYS[1], 'qty:' .. product_id, quantity)
+end
+redis.call('HINCRBY', KEYS[1], 'total_quantity', quantity - old_quantity)
+redis.call('HINCRBYFLOAT', KEYS[1], 'total_price', (quantity - old_quantity) * price)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# Запись корзины целиком. ARGV[2] - версия, прочитанная до запроса к БД: если с тех пор корзина
+# менялась, прочитанные данные устарели, корзина удаляется из кеша и не записывается.
+# Пустой ARGV[2] - запись после изменения в БД: версия увеличивается, запись безусловная
+CART_LOAD_SCRIPT = """
+if ARGV[2] == '' then
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+elseif (redis.call('GET', KEYS[2]) or '0') ~= ARGV[2] then
+    redis.call('DEL', KEYS[1])
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Время жизни корзины в кеше
+CART_TTL = 1800
+
+# Сравнение ID записей потока ("ms-seq"), общее для скриптов уведомлений
+STREAM_ID_LE_LUA = """
+local function id_le(a, b)
+    local a_ms, a_seq = string.match(a, '^(%d+)-(%d+)$')
+    local b_ms, b_seq = string.match(b, '^(%d+)-(%d+)$')
+    a_ms, b_ms = tonumber(a_ms), tonumber(b_ms)
+    if a_ms ~= b_ms then
+        return a_ms < b_ms
+    end
+    return tonumber(a_seq) <= tonumber(b_seq)
+end
+"""
+
+# Ключи скриптов уведомлений: поток, курсор прочтения, прочитанные после курсора ID, счетчик непрочитанных.
+# Добавление уведомления: самые старые записи сверх лимита удаляются с поправкой счетчика, затем XADD и INCR
+NOTIFICATION_ADD_SCRIPT = STREAM_ID_LE_LUA + """
+local limit = tonumber(ARGV[1])
+local overflow = redis.call('XLEN', KEYS[1]) - limit + 1
+if overflow > 0 then
+    local cursor = redis.call('GET', KEYS[2]) or '0-0'
+    for _, entry in ipairs(redis.call('XRANGE', KEYS[1], '-', '+', 'COUNT', overflow)) do
+        local id = entry[1]
+        if redis.call('SREM', KEYS[3], id) == 0 and not id_le(id, cursor) then
+            redis.call('DECR', KEYS[4])
+        end
+        redis.call('XDEL', KEYS[1], id)
+    end
+end
+local id = redis.call('XADD', KEYS[1], '*', unpack(ARGV, 2))
+redis.call('INCR', KEYS[4])
+return id
+"""
+
+# Отметка одного уведомления прочитанным; повторная отметка и отметка старше курсора ничего не меняют
+NOTIFICATION_MARK_READ_SCRIPT = STREAM_ID_LE_LUA + """
+local id = ARGV[1]
+if #redis.call('XRANGE', KEYS[1], id, id) == 0 then
+    return 0
+end
+if id_le(id, redis.call('GET', KEYS[2]) or '0-0') then
+    return 0
+end
+if redis.call('SADD', KEYS[3], id) == 0 then
+    return 0
+end
+if tonumber(redis.call('GET', KEYS[4]) or '0') > 0 then
+    redis.call('DECR', KEYS[4])
+end
+return 1
+"""
+
+# Отметка всех уведомлений прочитанными: курсор переносится на последнюю запись потока
+NOTIFICATION_MARK_ALL_READ_SCRIPT = """
+local last = redis.call('XREVRANGE', KEYS[1], '+', '-', 'COUNT', 1)
+if #last == 0 then
+    return 0
+end
+redis.call('SET', KEYS[2], last[1][1])
+redis.call('DEL', KEYS[3])
+redis.call('SET', KEYS[4], 0)
+return 1
+"""
+
+# Сколько последних уведомлений хранится у пользователя
+NOTIFICATION_HISTORY_LIMIT = 50
+
+# Теги схем значений, записываемых через serializer
+CACHE_DATA_SCHEMA = "cache.v1"
+TEMPORARY_DATA_SCHEMA = "temp.v1"
+INTERMEDIATE_RESULT_SCHEMA = "intermediate.v1"
+TAGGED_DATA_SCHEMA = "tagged.v1"
+# Счетчик всех вызовов invalidate_tags: защищает от записи результата, устаревшего во время запроса
+TAGS_EPOCH_KEY = "tags:epoch"
+
+# Канал, через который процессы сообщают друг другу об устаревших записях локального кеша
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+
+_connection_pool = None
+_binary_connection_pool = None
+_redis_service = None
+_lock = threading.RLock()
+
+
+def _create_connection_pool(decode_responses: bool) -> redis.ConnectionPool:
+    return redis.ConnectionPool(
+        host=REDIS_CONFIG['host'],
+        port=REDIS_CONFIG['port'],
+        db=REDIS_CONFIG['db'],
+        password=REDIS_CONFIG['password'],
+        max_connections=REDIS_CONFIG['max_connections'],
+        socket_timeout=REDIS_CONFIG['socket_timeout'],
+        socket_connect_timeout=REDIS_CONFIG['socket_connect_timeout'],
+        health_check_interval=REDIS_CONFIG['health_check_interval'],
+        decode_responses=decode_responses
+    )
+
+
+def get_connection_pool() -> redis.ConnectionPool:
+    """Общий для процесса пул соединений с Redis"""
+    global _connection_pool
+    if _connection_pool is None:
+        with _lock:
+            if _connection_pool is None:
+                _connection_pool = _create_connection_pool(decode_responses=True)
+    return _connection_pool
+
+
+def get_binary_connection_pool() -> redis.ConnectionPool:
+    """Общий для процесса пул соединений с Redis для сериализованных (двоичных) значений"""
+    global _binary_connection_pool
+    if _binary_connection_pool is None:
+        with _lock:
+            if _binary_connection_pool is None:
+                _binary_connection_pool = _create_connection_pool(decode_responses=False)
+    return _binary_connection_pool
+
+
+def get_redis_service() -> "RedisService":
+    """Общий для процесса экземпляр RedisService (создается при первом обращении)"""
+    global _redis_service
+    if _redis_service is None:
+        with _lock:
+            if _redis_service is None:
+                _redis_service = RedisService()
+    return _redis_service
+
+
+class LocalCache:
+    """
+    Ограниченный по размеру LRU-кеш в памяти процесса с TTL для каждой записи.
+
+    Значения хранятся как есть, без копирования: вызывающий код не должен их изменять.
+    Каждая инвалидация увеличивает поколение кеша; set с поколением, прочитанным до
+    обращения к Redis, не сохранит значение, если за это время пришла инвалидация.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._generation = 0
+        self._metrics = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str):
+        """
+        Получить значение по ключу
+        :return: значение или None, если записи нет или ее срок истек
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._metrics["hits"] += 1
+            return entry[0]
+
+    def set(self, key: str, value, ttl: float = None, generation: int = None) -> None:
+        """
+        Сохранить значение
+        :param ttl: время жизни в секундах (по умолчанию ttl кеша)
+        :param generation: поколение, прочитанное до загрузки значения; если с тех пор
+                           была инвалидация, значение не сохраняется
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + (ttl or self._ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._metrics["evictions"] += 1
+
+    def invalidate(self, keys=(), prefixes=()) -> None:
+        """Удалить записи по ключам и префиксам ключей"""
+        with self._lock:
+            self._generation += 1
+            self._metrics["invalidations"] += 1
+            for key in keys:
+                self._entries.pop(key, None)
+            if prefixes:
+                prefixes = tuple(prefixes)
+                for key in [key for key in self._entries if key.startswith(prefixes)]:
+                    del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["size"] = len(self._entries)
+        stats["max_entries"] = self._max_entries
+        return stats
+
+
 class RedisService:
-    def __init__(self):
-        try:
-            self.redis_client = redis.Redis(
-                host=REDIS_CONFIG['host'],
-                port=REDIS_CONFIG['port'],
-                db=REDIS_CONFIG['db'],
-                password=REDIS_CONFIG['password'],
-                decode_responses=True
-            )
-            # Проверка подключения
-            self.redis_client.ping()
-            logger.info("Successfully connected to Redis")
-            
-            # Инициализация PubSub
-            self.pubsub = self.redis_client.pubsub()
-            try:
-                logger.info("Attempting to subscribe to channels")
-                self.pubsub.subscribe("order_status_changed", "admin_notifications")
-                logger.info("Successfully subscribed to channels")
-            except Exception as e:
-                logger.error(f"Failed to subscribe to channels: {e}")
-                # Не прерываем выполнение, так как это не критическая ошибка
+    def __init__(self, connection_pool: redis.ConnectionPool = None, binary_connection_pool: redis.ConnectionPool = None):
+        try:
+            self.redis_client = redis.Redis(connection_pool=connection_pool or get_connection_pool())
+            # Клиент без декодирования ответов для значений, записанных через serializer
+            self.binary_client = redis.Redis(connection_pool=binary_connection_pool or get_binary_connection_pool())
+            self.serializer = get_serializer()
+            # Соединения открываются пулом при первой команде, а не при создании сервиса
+            # Локальный кеш процесса перед Redis; поток инвалидации запускается при первом обращении
+            self.local_cache = LocalCache(LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_TTL)
+            self._invalidation_thread = None
+            self._release_lock_script = self.redis_client.register_script(RELEASE_LOCK_SCRIPT)
+            self._get_tagged_script = self.binary_client.register_script(GET_TAGGED_SCRIPT)
+            self._cache_tagged_script = self.binary_client.register_script(CACHE_TAGGED_SCRIPT)
+            self._cart_add_item_script = self.redis_client.register_script(CART_ADD_ITEM_SCRIPT)
+            self._cart_set_quantity_script = self.redis_client.register_script(CART_SET_QUANTITY_SCRIPT)
+            self._cart_load_script = self.redis_client.register_script(CART_LOAD_SCRIPT)
+            self._notification_add_script = self.redis_client.register_script(NOTIFICATION_ADD_SCRIPT)
+            self._notification_mark_read_script = self.redis_client.register_script(NOTIFICATION_MARK_READ_SCRIPT)
+            self._notification_mark_all_read_script = self.redis_client.register_script(NOTIFICATION_MARK_ALL_READ_SCRIPT)
         except redis.ConnectionError as e:
             logger.error(f"Failed to connect to Redis: {e}")
             raise
 
+    # Local (in-process) cache
+    def get_local(self, key: str):
+        """
+        Получить значение из локального кеша процесса
+        :return: значение или None
+        """
+        self._ensure_invalidation_listener()
+        return self.local_cache.get(key)
+
+    def set_local(self, key: str, value, ttl: float = None, generation: int = None) -> None:
+        """
+        Сохранить значение в локальном кеше процесса
+        :param generation: поколение локального кеша, прочитанное до загрузки значения из Redis/БД
+        """
+        self._ensure_invalidation_listener()
+        self.local_cache.set(key, value, ttl, generation)
+
+    def invalidate_local(self, keys=(), prefixes=()) -> None:
+        """
+        Удалить записи из локального кеша этого и всех остальных процессов.
+        Вызывается после изменения данных в Redis/БД.
+        :param keys: ключи записей
+        :param prefixes: префиксы ключей записей
+        """
+        keys, prefixes = list(keys), list(prefixes)
+        self.local_cache.invalidate(keys, prefixes)
+        try:
+            self.redis_client.publish(CACHE_INVALIDATION_CHANNEL, json.dumps({"keys": keys, "prefixes": prefixes}))
+            logger.debug(f"Published local cache invalidation: keys={keys}, prefixes={prefixes}")
+        except Exception as e:
+            logger.error(f"Failed to publish local cache invalidation: {e}")
+            raise
+
+    def _ensure_invalidation_listener(self) -> None:
+        if self._invalidation_thread is None:
+            with _lock:
+                if self._invalidation_thread is None:
+                    self._invalidation_thread = threading.Thread(
+                        target=self._listen_invalidations, name="redis-cache-invalidation", daemon=True
+                    )
+                    self._invalidation_thread.start()
+
+    def _listen_invalidations(self) -> None:
+        """Фоновый поток: применяет к локальному кешу инвалидации из других процессов"""
+        backoff = 1
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                # Пока подписки не было, инвалидации могли быть пропущены
+                self.local_cache.clear()
+                backoff = 1
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    try:
+                        data = json.loads(message['data'])
+                    except json.JSONDecodeError as e:
+                        logger.error(f"Failed to decode cache invalidation: {e}")
+                        continue
+                    self.local_cache.invalidate(data.get("keys", ()), data.get("prefixes", ()))
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                logger.warning(f"Cache invalidation listener disconnected: {e}; retrying in {backoff}s")
+                self.local_cache.clear()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+                self.local_cache.clear()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    # Serialized values
+    def dump_value(self, value, schema: str) -> bytes:
+        """
+        Закодировать значение для записи через binary_client
+        :param schema: тег схемы значения
+        """
+        return self.serializer.dumps(value, schema)
+
+    def load_value(self, data, schema: str):
+        """
+        Декодировать значение, прочитанное через binary_client
+        :param schema: ожидаемый тег схемы
+        :return: значение или None, если значения нет или оно записано в другой схеме
+        """
+        if data is None:
+            return None
+        try:
+            return self.serializer.loads(data, schema)
+        except SerializationError as e:
+            logger.warning(f"Discarding cached value: {e}")
+            return None
+
+    # Short-lived locks (single-flight loading)
+    def acquire_locks(self, names: list, ttl_ms: int) -> dict:
+        """
+        Попытаться взять блокировки (SET NX PX) одним pipeline, не дожидаясь освобождения занятых
+        :param names: имена блокировок
+        :param ttl_ms: время жизни блокировки в миллисекундах
+        :return: словарь {имя: токен} для взятых блокировок
+        """
+        try:
+            if not names:
+                return {}
+            tokens = {name: uuid.uuid4().hex for name in names}
+            pipe = self.redis_client.pipeline(transaction=False)
+            for name, token in tokens.items():
+                pipe.set(f"lock:{name}", token, nx=True, px=ttl_ms)
+            results = pipe.execute()
+            return {name: token for (name, token), acquired in zip(tokens.items(), results) if acquired}
+        except Exception as e:
+            logger.error(f"Failed to acquire locks {names}: {e}")
+            raise
+
+    def release_locks(self, tokens: dict) -> None:
+        """
+        Снять блокировки, взятые через acquire_locks; чужие (перехваченные после истечения) не трогаются
+        :param tokens: словарь {имя: токен}
+        """
+        try:
+            if not tokens:
+                return
+            pipe = self.redis_client.pipeline(transaction=False)
+            for name, token in tokens.items():
+                self._release_lock_script(keys=[f"lock:{name}"], args=[token], client=pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to release locks {list(tokens)}: {e}")
+            raise
+
     # Token management
     def store_token(self, user_id: str, token: str, ttl: int = 3600):
         """Store user token with TTL"""
@@ -72,121 +536,348 @@ class RedisService:
             raise
 
     # Session management
+    # session:{session_id} хранит данные сессии, user:{user_id}:sessions - индекс id сессий пользователя,
+    # чтобы находить сессии пользователя без сканирования всего keyspace
+    def _user_sessions_key(self, user_id) -> str:
+        return f"user:{user_id}:sessions"
+
     def store_session(self, session_id: str, data: dict, ttl: int = 1800):
-        """Store session data"""
+        """Store session data and register it in the user's session index"""
         try:
-            self.redis_client.setex(f"session:{session_id}", ttl, json.dumps(data))
+            pipe = self.redis_client.pipeline()
+            pipe.setex(f"session:{session_id}", ttl, json.dumps(data))
+            if data.get('user_id') is not None:
+                index_key = self._user_sessions_key(data['user_id'])
+                pipe.sadd(index_key, session_id)
+                # Индекс живет не меньше самой долгой из сессий пользователя
+                pipe.expire(index_key, ttl, nx=True)
+                pipe.expire(index_key, ttl, gt=True)
+            pipe.execute()
             logger.info(f"Stored session {session_id} with TTL {ttl}")
         except Exception as e:
             logger.error(f"Failed to store session {session_id}: {e}")
             raise
 
-    def get_session(self, session_id: str) -> dict:
-        """Get session data"""
+    def get_session(self, session_id: str, ttl: int = None) -> dict:
+        """
+        Get session data
+        :param session_id: ID сессии
+        :param ttl: если указан, срок жизни сессии продлевается на ttl секунд (скользящее истечение)
+        """
         try:
-            data = self.redis_client.get(f"session:{session_id}")
+            key = f"session:{session_id}"
+            data = self.redis_client.getex(key, ex=ttl) if ttl else self.redis_client.get(key)
             if data:
                 logger.info(f"Retrieved session {session_id}")
-                return json.loads(data)
+                session_data = json.loads(data)
+                if ttl and session_data.get('user_id') is not None:
+                    self.redis_client.expire(self._user_sessions_key(session_data['user_id']), ttl, gt=True)
+                return session_data
             logger.warning(f"Session {session_id} not found")
             return None
         except Exception as e:
             logger.error(f"Failed to get session {session_id}: {e}")
             raise
 
+    def get_user_sessions(self, user_id: str) -> dict:
+        """
+        Get all live sessions of a user via the session index
+        :return: словарь {session_id: данные сессии}
+        """
+        try:
+            index_key = self._user_sessions_key(user_id)
+            session_ids = list(self.redis_client.smembers(index_key))
+            if not session_ids:
+                return {}
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            for session_id in session_ids:
+                pipe.get(f"session:{session_id}")
+            values = pipe.execute()
+
+            sessions = {}
+            expired = []
+            for session_id, data in zip(session_ids, values):
+                if data:
+                    sessions[session_id] = json.loads(data)
+                else:
+                    expired.append(session_id)
+            # Убираем из индекса сессии, которые уже истекли
+            if expired:
+                self.redis_client.srem(index_key, *expired)
+            return sessions
+        except Exception as e:
+            logger.error(f"Failed to get sessions for user {user_id}: {e}")
+            raise
+
+    def delete_session(self, session_id: str):
+        """Delete session and remove it from the user's session index"""
+        try:
+            key = f"session:{session_id}"
+            data = self.redis_client.get(key)
+            pipe = self.redis_client.pipeline()
+            pipe.delete(key)
+            if data:
+                user_id = json.loads(data).get('user_id')
+                if user_id is not None:
+                    pipe.srem(self._user_sessions_key(user_id), session_id)
+            pipe.execute()
+            logger.info(f"Deleted session {session_id}")
+        except Exception as e:
+            logger.error(f"Failed to delete session {session_id}: {e}")
+            raise
+
     # Product caching
+    CATALOG_KEY = product_cache.catalog_key()
+
     def cache_products(self, products_data: list, ttl: int = 3600):
-        """Cache products list with TTL"""
-        try:
-            # Store products as a hash for efficient updates
-            for product in products_data:
-                # Store basic product info (name and id)
-                self.redis_client.hset(
-                    f"product:{product['product_id']}",
-                    mapping={
-                        'product_id': product['product_id'],
-                        'name': product['name']
-                    }
-                )
-                self.redis_client.expire(f"product:{product['product_id']}", ttl)
-            
-            # Store product IDs list for quick access
-            product_ids = [str(p['product_id']) for p in products_data]
-            self.redis_client.sadd("products:all", *product_ids)
-            self.redis_client.expire("products:all", ttl)
-            
+        """
+        Cache products list with TTL.
+        The whole catalog is stored as one serialized snapshot: SET replaces it
+        atomically, so readers see either the old or the new catalog.
+        """
+        try:
+            summaries = [product_cache.encode_summary(product) for product in products_data]
+            generation = self.local_cache.generation
+            self.binary_client.set(self.CATALOG_KEY, self.dump_value(summaries, product_cache.SUMMARY_SCHEMA), ex=ttl)
+            self.set_local(self.CATALOG_KEY, summaries, generation=generation)
             logger.info(f"Cached {len(products_data)} products")
         except Exception as e:
             logger.error(f"Failed to cache products: {e}")
             raise
 
     def get_cached_products(self) -> list:
-        """Get all cached products"""
+        """Get all cached products (from the local cache first, then from Redis)"""
         try:
-            # Get all product IDs
-            product_ids = self.redis_client.smembers("products:all")
-            if not product_ids:
+            products = self.get_local(self.CATALOG_KEY)
+            if products is not None:
+                return products
+            generation = self.local_cache.generation
+            products = self.load_value(self.binary_client.get(self.CATALOG_KEY), product_cache.SUMMARY_SCHEMA)
+            if not products:
                 return []
-            
-            # Get all products data
-            products = []
-            for pid in product_ids:
-                product_data = self.redis_client.hgetall(f"product:{pid}")
-                if product_data and 'name' in product_data and 'product_id' in product_data:
-                    products.append({
-                        'name': product_data['name'],
-                        'product_id': int(product_data['product_id'])
-                    })
-            
+            self.set_local(self.CATALOG_KEY, products, generation=generation)
             return products
         except Exception as e:
             logger.error(f"Failed to get cached products: {e}")
             raise
 
-    # Cart caching
-    def cache_cart(self, user_id: str, cart_data: list, ttl: int = 1800):
-        """Cache user's cart data"""
-        try:
-            cart_key = f"cart:{user_id}"
-            # Store cart items as a hash
-            for item in cart_data:
-                # Convert datetime to string
-                if 'added_date' in item:
-                    item['added_date'] = item['added_date'].isoformat()
-                self.redis_client.hset(
-                    cart_key,
-                    str(item['product_id']),
-                    json.dumps(item)
-                )
-            self.redis_client.expire(cart_key, ttl)
-            logger.info(f"Cached cart for user {user_id}")
+    def invalidate_products(self):
+        """Drop the catalog snapshot in Redis and in every process's local cache"""
+        try:
+            self.redis_client.delete(self.CATALOG_KEY)
+            self.invalidate_local(keys=[self.CATALOG_KEY])
+            logger.info("Invalidated products catalog")
+        except Exception as e:
+            logger.error(f"Failed to invalidate products catalog: {e}")
+            raise
+
+    # Cart (write-through hash)
+    def _cart_key(self, user_id) -> str:
+        return f"cart:v2:{user_id}"
+
+    def _cart_keys(self, user_id) -> list:
+        return [self._cart_key(user_id), f"{self._cart_key(user_id)}:version"]
+
+    def get_cart_version(self, user_id) -> str:
+        """Версия корзины для load_cart; читается до запроса корзины из БД"""
+        try:
+            return self.redis_client.get(self._cart_keys(user_id)[1]) or "0"
+        except Exception as e:
+            logger.error(f"Failed to get cart version for user {user_id}: {e}")
+            raise
+
+    def load_cart(self, user_id, items: list, ttl: int = CART_TTL, version: str = None) -> bool:
+        """
+        Записать корзину пользователя целиком.
+        Hash корзины: qty:{id}, price:{id}, added:{id} для каждого товара,
+        total_quantity и total_price - текущие итоги, loaded - признак полной корзины.
+        :param items: товары корзины: product_id, quantity, price, added_date
+        :param version: версия get_cart_version, прочитанная до запроса к БД; если корзина с тех пор
+            менялась, она не записывается, а удаляется из кеша. None - запись после изменения корзины в БД
+        :return: True, если корзина записана
+        """
+        try:
+            mapping = {"loaded": 1, "total_quantity": 0, "total_price": 0.0}
+            for item in items:
+                product_id = item['product_id']
+                added_date = item.get('added_date')
+                mapping[f"qty:{product_id}"] = int(item['quantity'])
+                mapping[f"price:{product_id}"] = float(item['price'])
+                mapping[f"added:{product_id}"] = added_date.isoformat() if isinstance(added_date, datetime) else str(added_date or "")
+                mapping["total_quantity"] += int(item['quantity'])
+                mapping["total_price"] += int(item['quantity']) * float(item['price'])
+
+            fields = [item for pair in mapping.items() for item in pair]
+            loaded = self._cart_load_script(keys=self._cart_keys(user_id), args=[ttl, version or ""] + fields)
+            if loaded:
+                logger.info(f"Cached cart for user {user_id}")
+            else:
+                logger.info(f"Cart of user {user_id} changed while it was being read, not caching it")
+            return bool(loaded)
         except Exception as e:
             logger.error(f"Failed to cache cart: {e}")
             raise
 
-    def get_cached_cart(self, user_id: str) -> list:
-        """Get user's cached cart"""
+    def get_cart(self, user_id) -> dict:
+        """
+        Получить корзину пользователя из hash
+        :return: {"items": [{product_id, quantity, price, added_date}], "total_quantity", "total_price"}
+                 или None, если корзины нет в кеше
+        """
         try:
-            cart_key = f"cart:{user_id}"
-            cart_data = self.redis_client.hgetall(cart_key)
-            if not cart_data:
-                return []
-            
-            result = []
-            for item in cart_data.values():
-                item_data = json.loads(item)
-                # Convert string back to datetime if needed
-                if 'added_date' in item_data:
-                    try:
-                        item_data['added_date'] = datetime.fromisoformat(item_data['added_date'])
-                    except (ValueError, TypeError):
-                        pass
-                result.append(item_data)
-            return result
+            cart_data = self.redis_client.hgetall(self._cart_key(user_id))
+            if not cart_data.get("loaded"):
+                return None
+
+            items = []
+            for field, quantity in cart_data.items():
+                if not field.startswith("qty:"):
+                    continue
+                product_id = field[len("qty:"):]
+                added_date = cart_data.get(f"added:{product_id}")
+                try:
+                    added_date = datetime.fromisoformat(added_date) if added_date else None
+                except ValueError:
+                    pass
+                items.append({
+                    "product_id": int(product_id),
+                    "quantity": int(quantity),
+                    "price": float(cart_data.get(f"price:{product_id}", 0)),
+                    "added_date": added_date,
+                })
+            return {
+                "items": items,
+                "total_quantity": int(cart_data.get("total_quantity", 0)),
+                "total_price": float(cart_data.get("total_price", 0)),
+            }
         except Exception as e:
             logger.error(f"Failed to get cached cart: {e}")
             raise
 
+    def cart_add_item(self, user_id, product_id: int, quantity: int, price: float, ttl: int = CART_TTL) -> bool:
+        """
+        Увеличить количество товара в закешированной корзине и ее итоги (HINCRBY/HINCRBYFLOAT).
+        Если корзины нет в кеше, ничего не делает: она будет прочитана из БД целиком.
+        :return: True, если корзина в кеше обновлена
+        """
+        try:
+            added_date = datetime.now().isoformat()
+            return bool(self._cart_add_item_script(
+                keys=self._cart_keys(user_id), args=[product_id, quantity, price, added_date, ttl]
+            ))
+        except Exception as e:
+            logger.error(f"Failed to add product {product_id} to cached cart: {e}")
+            raise
+
+    def cart_set_item_quantity(self, user_id, product_id: int, quantity: int, ttl: int = CART_TTL) -> bool:
+        """
+        Установить количество товара в закешированной корзине (HSET, при 0 - HDEL) и пересчитать итоги.
+        Если корзины нет в кеше, ничего не делает.
+        :return: True, если корзина в кеше обновлена
+        """
+        try:
+            return bool(self._cart_set_quantity_script(
+                keys=self._cart_keys(user_id), args=[product_id, quantity, ttl]
+            ))
+        except Exception as e:
+            logger.error(f"Failed to update product {product_id} in cached cart: {e}")
+            raise
+
+    def delete_cart(self, user_id, ttl: int = CART_TTL):
+        """Удалить корзину пользователя из кеша (и не дать записать прочитанную до этого)"""
+        try:
+            cart_key, version_key = self._cart_keys(user_id)
+            pipe = self.redis_client.pipeline()
+            pipe.delete(cart_key)
+            pipe.incr(version_key)
+            pipe.expire(version_key, ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to delete cached cart: {e}")
+            raise
+
+    # Notifications (stream + last-read cursor)
+    def _notification_keys(self, user_id) -> list:
+        prefix = f"notifications:v2:{user_id}"
+        return [prefix, f"{prefix}:read_cursor", f"{prefix}:read_ids", f"{prefix}:unread"]
+
+    @staticmethod
+    def _stream_id(entry_id: str) -> tuple:
+        ms, seq = entry_id.split("-")
+        return int(ms), int(seq)
+
+    def add_notification(self, user_id, fields: dict, limit: int = NOTIFICATION_HISTORY_LIMIT) -> str:
+        """
+        Добавить уведомление в поток пользователя и увеличить счетчик непрочитанных
+        :param fields: поля уведомления (строки)
+        :param limit: сколько последних уведомлений хранить
+        :return: ID записи потока, он же ID уведомления
+        """
+        try:
+            args = [limit]
+            for field, value in fields.items():
+                args.extend((field, value))
+            return self._notification_add_script(keys=self._notification_keys(user_id), args=args)
+        except Exception as e:
+            logger.error(f"Failed to add notification for user {user_id}: {e}")
+            raise
+
+    def get_notifications(self, user_id, limit: int = 10, before: str = None) -> list:
+        """
+        Страница уведомлений от новых к старым (XREVRANGE) с признаком прочтения
+        :param before: ID уведомления, после которого (в сторону старых) начинается страница
+        :return: список словарей с полями записи, id и read
+        """
+        try:
+            stream_key, cursor_key, read_ids_key, _ = self._notification_keys(user_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.xrevrange(stream_key, max=f"({before}" if before else "+", min="-", count=limit)
+            pipe.get(cursor_key)
+            pipe.smembers(read_ids_key)
+            entries, cursor, read_ids = pipe.execute()
+
+            cursor = self._stream_id(cursor) if cursor else (0, 0)
+            notifications = []
+            for entry_id, fields in entries:
+                notification = dict(fields)
+                notification["id"] = entry_id
+                notification["read"] = self._stream_id(entry_id) <= cursor or entry_id in read_ids
+                notifications.append(notification)
+            return notifications
+        except Exception as e:
+            logger.error(f"Failed to get notifications for user {user_id}: {e}")
+            raise
+
+    def mark_notification_read(self, user_id, notification_id: str) -> bool:
+        """
+        Отметить уведомление прочитанным и уменьшить счетчик непрочитанных
+        :return: True, если уведомление было непрочитанным
+        """
+        try:
+            return bool(self._notification_mark_read_script(
+                keys=self._notification_keys(user_id), args=[notification_id]
+            ))
+        except Exception as e:
+            logger.error(f"Failed to mark notification {notification_id} as read: {e}")
+            raise
+
+    def mark_all_notifications_read(self, user_id) -> None:
+        """Перенести курсор прочтения на последнее уведомление и обнулить счетчик"""
+        try:
+            self._notification_mark_all_read_script(keys=self._notification_keys(user_id))
+        except Exception as e:
+            logger.error(f"Failed to mark notifications as read for user {user_id}: {e}")
+            raise
+
+    def get_unread_notification_count(self, user_id) -> int:
+        """Количество непрочитанных уведомлений (один GET)"""
+        try:
+            return int(self.redis_client.get(self._notification_keys(user_id)[3]) or 0)
+        except Exception as e:
+            logger.error(f"Failed to get unread notification count for user {user_id}: {e}")
+            raise
+
     # Order status management with PubSub
     def update_order_status(self, order_id: str, status: str, user_id: str = None):
         """Update order status and notify subscribers"""
@@ -194,6 +885,7 @@ class RedisService:
             logger.info(f"Updating order {order_id} status to {status}")
             # Store order status
             self.redis_client.set(f"order:{order_id}:status", status)
+            self.invalidate_local(keys=[f"order:{order_id}:status"])
             
             # Publish status change event
             event_data = {
@@ -219,7 +911,14 @@ class RedisService:
     def get_order_status(self, order_id: str) -> str:
         """Get order status"""
         try:
-            return self.redis_client.get(f"order:{order_id}:status")
+            key = f"order:{order_id}:status"
+            status = self.get_local(key)
+            if status is None:
+                generation = self.local_cache.generation
+                status = self.redis_client.get(key)
+                if status is not None:
+                    self.set_local(key, status, generation=generation)
+            return status
         except Exception as e:
             logger.error(f"Failed to get order status: {e}")
             raise
@@ -252,39 +951,11 @@ class RedisService:
             logger.error(f"Failed to publish message to channel {channel}: {e}")
             raise
 
-    def subscribe_to_channel(self, channel: str):
-        """Subscribe to channel"""
-        try:
-            self.pubsub.subscribe(channel)
-            logger.info(f"Subscribed to channel {channel}")
-        except Exception as e:
-            logger.error(f"Failed to subscribe to channel {channel}: {e}")
-            raise
-
-    def get_message(self):
-        """Get message from subscribed channels"""
-        try:
-            message = self.pubsub.get_message()
-            if message:
-                logger.debug(f"Received message: {message}")
-                if message['type'] == 'message':
-                    try:
-                        data = json.loads(message['data'])
-                        logger.info(f"Received message from channel {message['channel']}: {data}")
-                        return data
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Failed to decode message data: {e}")
-                        return None
-            return None
-        except Exception as e:
-            logger.error(f"Failed to get message: {e}")
-            return None
-
     # Cache management
     def cache_data(self, key: str, data: dict, ttl: int = 300):
         """Cache data with TTL"""
         try:
-            self.redis_client.setex(f"cache:{key}", ttl, json.dumps(data))
+            self.binary_client.setex(f"cache:{key}", ttl, self.dump_value(data, CACHE_DATA_SCHEMA))
             logger.info(f"Cached data for key {key} with TTL {ttl}")
         except Exception as e:
             logger.error(f"Failed to cache data for key {key}: {e}")
@@ -293,10 +964,10 @@ class RedisService:
     def get_cached_data(self, key: str) -> dict:
         """Get cached data"""
         try:
-            data = self.redis_client.get(f"cache:{key}")
-            if data:
+            data = self.load_value(self.binary_client.get(f"cache:{key}"), CACHE_DATA_SCHEMA)
+            if data is not None:
                 logger.info(f"Retrieved cached data for key {key}")
-                return json.loads(data)
+                return data
             logger.warning(f"No cached data found for key {key}")
             return None
         except Exception as e:
@@ -312,27 +983,16 @@ class RedisService:
             logger.error(f"Failed to invalidate cache for key {key}: {e}")
             raise
 
-    def close_pubsub(self):
-        """Safely close PubSub connection"""
-        try:
-            if hasattr(self, 'pubsub') and self.pubsub:
-                logger.info("Attempting to close PubSub connection")
-                self.pubsub.unsubscribe()
-                self.pubsub.close()
-                logger.info("PubSub connection closed successfully")
-        except Exception as e:
-            logger.error(f"Error while closing PubSub connection: {e}")
-
     def __del__(self):
         """Destructor to ensure connections are closed"""
         logger.info("Cleaning up Redis connections")
-        self.close_pubsub()
-        if hasattr(self, 'redis_client'):
-            try:
-                self.redis_client.close()
-                logger.info("Redis client connection closed")
-            except Exception as e:
-                logger.error(f"Error while closing Redis connection: {e}")
+        for client_name in ('redis_client', 'binary_client'):
+            if hasattr(self, client_name):
+                try:
+                    getattr(self, client_name).close()
+                    logger.info("Redis client connection closed")
+                except Exception as e:
+                    logger.error(f"Error while closing Redis connection: {e}")
 
     def cache_temporary_data(self, key: str, data: dict, ttl: int = 300):
         """
@@ -343,7 +1003,7 @@ class RedisService:
         """
         try:
             temp_key = f"temp:{key}"
-            self.redis_client.setex(temp_key, ttl, json.dumps(data))
+            self.binary_client.setex(temp_key, ttl, self.dump_value(data, TEMPORARY_DATA_SCHEMA))
             logger.info(f"Временные данные закешированы с ключом {temp_key}")
         except Exception as e:
             logger.error(f"Ошибка кеширования временных данных: {e}")
@@ -357,10 +1017,10 @@ class RedisService:
         """
         try:
             temp_key = f"temp:{key}"
-            data = self.redis_client.get(temp_key)
-            if data:
+            data = self.load_value(self.binary_client.get(temp_key), TEMPORARY_DATA_SCHEMA)
+            if data is not None:
                 logger.info(f"Получены временные данные по ключу {temp_key}")
-                return json.loads(data)
+                return data
             return None
         except Exception as e:
             logger.error(f"Ошибка получения временных данных: {e}")
@@ -388,7 +1048,7 @@ class RedisService:
         """
         try:
             intermediate_key = f"intermediate:{operation_id}"
-            self.redis_client.setex(intermediate_key, ttl, json.dumps(data))
+            self.binary_client.setex(intermediate_key, ttl, self.dump_value(data, INTERMEDIATE_RESULT_SCHEMA))
             logger.info(f"Промежуточные результаты закешированы с ключом {intermediate_key}")
         except Exception as e:
             logger.error(f"Ошибка кеширования промежуточных результатов: {e}")
@@ -402,38 +1062,113 @@ class RedisService:
         """
         try:
             intermediate_key = f"intermediate:{operation_id}"
-            data = self.redis_client.get(intermediate_key)
-            if data:
+            data = self.load_value(self.binary_client.get(intermediate_key), INTERMEDIATE_RESULT_SCHEMA)
+            if data is not None:
                 logger.info(f"Получены промежуточные результаты по ключу {intermediate_key}")
-                return json.loads(data)
+                return data
             return None
         except Exception as e:
             logger.error(f"Ошибка получения промежуточных результатов: {e}")
             raise
 
+    # Tagged results: invalidated by bumping the generation of any of their tags
+    def _tag_generation_key(self, tag: str) -> str:
+        return f"tag:{tag}:gen"
+
+    def snapshot_tags(self, tags: list) -> dict:
+        """
+        Снимок поколений тегов для cache_tagged_data; читается до запроса к БД.
+        Кроме самих тегов в снимок входит общий счетчик инвалидаций: по нему видно,
+        что во время запроса менялись и теги, которые станут известны только из его результата.
+        :param tags: Теги, известные до запроса (например, catalog)
+        :return: {ключ поколения: значение}
+        """
+        try:
+            keys = [self._tag_generation_key(tag) for tag in dict.fromkeys(tags)] + [TAGS_EPOCH_KEY]
+            return {key: generation or "0" for key, generation in zip(keys, self.redis_client.mget(keys))}
+        except Exception as e:
+            logger.error(f"Failed to snapshot tags {tags}: {e}")
+            raise
+
+    def cache_tagged_data(self, key: str, data, tags: list, ttl: int = 3600, generations: dict = None) -> bool:
+        """
+        Кеширование результата, зависящего от набора тегов (например, product:42, catalog).
+        Результат перестает читаться, как только по любому из его тегов вызван invalidate_tags,
+        поэтому TTL может быть длинным.
+        :param key: Ключ результата
+        :param data: Данные для кеширования
+        :param tags: Теги, от которых зависит результат
+        :param ttl: Время жизни в секундах (по умолчанию 1 час)
+        :param generations: снимок snapshot_tags, сделанный до чтения данных; если с тех пор
+            были инвалидации, результат не записывается
+        :return: записан ли результат
+        """
+        try:
+            tags = list(dict.fromkeys(tags))
+            generations = generations or {}
+            snapshot = [item for pair in generations.items() for item in pair]
+            written = self._cache_tagged_script(
+                keys=[f"tagged:{key}"],
+                args=[ttl, self.dump_value(data, TAGGED_DATA_SCHEMA), len(generations)] + snapshot + tags,
+            )
+            if written:
+                logger.info(f"Cached tagged data for key {key} with {len(tags)} tags")
+            else:
+                logger.info(f"Skipped caching {key}: its tags were invalidated while it was being computed")
+            return bool(written)
+        except Exception as e:
+            logger.error(f"Failed to cache tagged data for key {key}: {e}")
+            raise
+
+    def get_tagged_data(self, key: str):
+        """
+        Получение результата, закешированного через cache_tagged_data
+        :param key: Ключ результата
+        :return: Данные или None, если результата нет или какой-то из его тегов инвалидирован
+        """
+        try:
+            data = self._get_tagged_script(keys=[f"tagged:{key}"])
+            return self.load_value(data, TAGGED_DATA_SCHEMA)
+        except Exception as e:
+            logger.error(f"Failed to get tagged data for key {key}: {e}")
+            raise
+
+    def invalidate_tags(self, tags: list):
+        """
+        Инвалидировать все результаты, зависящие от тегов (увеличивает поколения тегов)
+        :param tags: Теги, например ["product:42"]
+        """
+        try:
+            if not tags:
+                return
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(self._tag_generation_key(tag))
+            pipe.incr(TAGS_EPOCH_KEY)
+            pipe.execute()
+            logger.info(f"Invalidated tags {list(tags)}")
+        except Exception as e:
+            logger.error(f"Failed to invalidate tags {tags}: {e}")
+            raise
+
     def cleanup_user_sessions(self, user_id: str) -> None:
         """
         Clean up all sessions for a specific user
         :param user_id: The user ID to clean up sessions for
         """
         try:
-            # Get all session keys
-            session_keys = self.redis_client.keys("session:*")
-            
-            for session_key in session_keys:
-                # Get session data
-                session_data = self.redis_client.hgetall(session_key)
-                
-                # If session belongs to this user, delete it
-                if session_data.get('user_id') == user_id:
-                    self.redis_client.delete(session_key)
+            index_key = self._user_sessions_key(user_id)
+            session_ids = self.redis_client.smembers(index_key)
+
+            pipe = self.redis_client.pipeline()
+            for session_id in session_ids:
+                pipe.delete(f"session:{session_id}")
+            pipe.delete(index_key)
+            pipe.execute()
             
             # Also delete user's token
             self.delete_token(user_id)
             
-            # Close PubSub connection
-            self.close_pubsub()
-            
             print(f"Cleaned up all sessions for user {user_id}")
         except Exception as e:
             print(f"Error cleaning up user sessions: {e}")
@@ -454,12 +1189,6 @@ class RedisService:
             logger.info(f"Sending low stock notification for product {product_name}")
             logger.debug(f"Notification data: {event_data}")
             
-            # Проверяем, что PubSub все еще активен
-            if not hasattr(self, 'pubsub') or not self.pubsub:
-                logger.warning("PubSub connection lost, attempting to reconnect...")
-                self.pubsub = self.redis_client.pubsub()
-                self.pubsub.subscribe("order_status_changed", "admin_notifications")
-            
             self.publish_event("admin_notifications", event_data)
             logger.info("Low stock notification sent successfully")
         except Exception as e:
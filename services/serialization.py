@@ -0,0 +1,160 @@
+"""
+Сериализация значений, которые RedisService хранит в Redis.
+
+Значение записывается кадром: MAGIC, id кодека, флаги, длина и текст тега схемы, полезная нагрузка.
+Тег схемы (например "cart.v1") проверяется при чтении, поэтому значение другой схемы
+не будет прочитано как свое. Полезная нагрузка больше порога сжимается zlib.
+Кодек выбирается настройкой REDIS_SERIALIZER (msgpack, orjson, json); прочитать можно
+кадр любого установленного кодека, а также старые значения в виде JSON-строки без кадра.
+"""
+import json
+import logging
+import threading
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from settings import REDIS_SERIALIZER, REDIS_COMPRESSION_THRESHOLD, REDIS_COMPRESSION_LEVEL
+
+logger = logging.getLogger(__name__)
+
+# Первый байт кадра; JSON-текст не может начинаться с этого байта
+FRAME_MAGIC = 0xA7
+FLAG_COMPRESSED = 0x01
+
+
+class SerializationError(ValueError):
+    """Значение не удалось прочитать: поврежденный кадр, неизвестный кодек или другая схема"""
+
+
+def _json_default(value):
+    # datetime, Decimal и т.п. сохраняются строкой, как в прежнем json.dumps(..., default=str)
+    return str(value)
+
+
+class JsonCodec:
+    codec_id = ord("j")
+
+    def dumps(self, value) -> bytes:
+        return json.dumps(value, default=_json_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data: bytes):
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    codec_id = ord("o")
+
+    def dumps(self, value) -> bytes:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: bytes):
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    codec_id = ord("m")
+
+    def dumps(self, value) -> bytes:
+        return msgpack.packb(value, default=_json_default, use_bin_type=True)
+
+    def loads(self, data: bytes):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def _available_codecs() -> dict:
+    codecs = {"json": JsonCodec()}
+    if orjson is not None:
+        codecs["orjson"] = OrjsonCodec()
+    if msgpack is not None:
+        codecs["msgpack"] = MsgpackCodec()
+    return codecs
+
+
+class Serializer:
+    """
+    Кодирование значений в кадры с тегом схемы и необязательным сжатием.
+    :param codec: имя кодека для записи (msgpack, orjson, json)
+    :param compression_threshold: полезная нагрузка длиннее стольких байт сжимается; 0 - не сжимать
+    :param compression_level: уровень сжатия zlib
+    """
+
+    def __init__(self, codec: str = "json", compression_threshold: int = 1024, compression_level: int = 1):
+        self._codecs = _available_codecs()
+        self._codecs_by_id = {c.codec_id: c for c in self._codecs.values()}
+        if codec not in self._codecs:
+            logger.warning(f"Serializer codec '{codec}' is not available, falling back to json")
+            codec = "json"
+        self.codec_name = codec
+        self._codec = self._codecs[codec]
+        self._compression_threshold = compression_threshold
+        self._compression_level = compression_level
+
+    def dumps(self, value, schema: str) -> bytes:
+        """
+        Закодировать значение
+        :param value: значение из dict/list/str/int/float/bool/None
+        :param schema: тег схемы значения
+        :return: кадр для записи в Redis
+        """
+        payload = self._codec.dumps(value)
+        flags = 0
+        if self._compression_threshold and len(payload) > self._compression_threshold:
+            payload = zlib.compress(payload, self._compression_level)
+            flags |= FLAG_COMPRESSED
+        tag = schema.encode("utf-8")
+        return bytes((FRAME_MAGIC, self._codec.codec_id, flags, len(tag))) + tag + payload
+
+    def loads(self, data, schema: str):
+        """
+        Декодировать значение
+        :param data: кадр из Redis (или старое значение в виде JSON-строки)
+        :param schema: ожидаемый тег схемы
+        :raises SerializationError: кадр поврежден, кодек недоступен или тег схемы не совпадает
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        try:
+            if not data or data[0] != FRAME_MAGIC:
+                # Значение, записанное до появления кадров
+                return json.loads(data)
+
+            codec = self._codecs_by_id.get(data[1])
+            if codec is None:
+                raise SerializationError(f"Unknown codec id {data[1]}")
+            flags = data[2]
+            tag_end = 4 + data[3]
+            tag = data[4:tag_end].decode("utf-8")
+            if tag != schema:
+                raise SerializationError(f"Schema mismatch: expected '{schema}', got '{tag}'")
+            payload = data[tag_end:]
+            if flags & FLAG_COMPRESSED:
+                payload = zlib.decompress(payload)
+            return codec.loads(payload)
+        except SerializationError:
+            raise
+        except Exception as e:
+            raise SerializationError(f"Could not decode value with schema '{schema}': {e}") from e
+
+
+_serializer = None
+_lock = threading.Lock()
+
+
+def get_serializer() -> Serializer:
+    """Общий для процесса сериализатор, настроенный через settings"""
+    global _serializer
+    if _serializer is None:
+        with _lock:
+            if _serializer is None:
+                _serializer = Serializer(REDIS_SERIALIZER, REDIS_COMPRESSION_THRESHOLD, REDIS_COMPRESSION_LEVEL)
+                logger.info(f"Using {_serializer.codec_name} serializer for Redis values")
+    return _serializer
@@ -3,10 +3,25 @@ import psycopg2.extras
 from repositories.settings import DB_CONFIG
 from pandas import DataFrame
 import repositories.users
+from services.redis_service import get_redis_service
+
+redis_service = get_redis_service()
+
+
+def _user_cache_key(email) -> str:
+    return f"user:email:{email}"
+
 
 def get_user(email) -> DataFrame:
 
-    user = repositories.users.get_user_by_email(email)
+    # Пользователь читается на каждом перезапуске страницы, поэтому держим его в локальном кеше
+    user = redis_service.get_local(_user_cache_key(email))
+    if user is None:
+        generation = redis_service.local_cache.generation
+        user = repositories.users.get_user_by_email(email)
+        # Пустой результат не кешируем: пользователь с этим email может зарегистрироваться в любой момент
+        if user:
+            redis_service.set_local(_user_cache_key(email), user, generation=generation)
 
     result = DataFrame(user)
 
@@ -18,6 +33,10 @@ def get_user(email) -> DataFrame:
 
     return result
 
+def invalidate_user(email) -> None:
+    """Сбросить пользователя из локального кеша всех процессов (после изменения его данных)"""
+    redis_service.invalidate_local(keys=[_user_cache_key(email)])
+
 def get_user_balance(user_email) -> float:
 
     return repositories.users.get_user_balance_by_email(user_email)
@@ -27,5 +46,6 @@ def get_user_balance(user_email) -> float:
 
 def set_user_balance(user_email, new_balance: float) -> None:
     repositories.users.set_user_balance_by_email(user_email, new_balance)
+    invalidate_user(user_email)
     print("баланс пользователея пополнен до new_balance", new_balance)
 
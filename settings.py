@@ -16,6 +16,10 @@ REDIS_CONFIG = {
     "port": int(os.getenv("REDIS_PORT", 6379)),
     "db": int(os.getenv("REDIS_DB", 0)),
     "password": os.getenv("REDIS_PASSWORD", "redis_password"),
+    "max_connections": int(os.getenv("REDIS_MAX_CONNECTIONS", 50)),
+    "socket_timeout": float(os.getenv("REDIS_SOCKET_TIMEOUT", 5)),
+    "socket_connect_timeout": float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 5)),
+    "health_check_interval": int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30)),
 }
 
 JWT_CONFIG = {
@@ -26,3 +30,23 @@ JWT_CONFIG = {
 
 POOL_MIN_CONN = int(os.getenv("POOL_MIN_CONN", 1))
 POOL_MAX_CONN = int(os.getenv("POOL_MAX_CONN", 10))
+POOL_MAX_LIFETIME = float(os.getenv("POOL_MAX_LIFETIME", 1800))
+POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("POOL_HEALTH_CHECK_INTERVAL", 30))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("POOL_ACQUIRE_TIMEOUT", 10))
+# asyncpg не ограничивает общий срок жизни соединения (как POOL_MAX_LIFETIME в синхронном пуле),
+# а закрывает соединения, простаивающие дольше этого числа секунд
+ASYNC_POOL_MAX_IDLE_TIME = float(os.getenv("ASYNC_POOL_MAX_IDLE_TIME", 300))
+
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", 1024))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", 30))
+
+REDIS_SERIALIZER = os.getenv("REDIS_SERIALIZER", "orjson")
+REDIS_COMPRESSION_THRESHOLD = int(os.getenv("REDIS_COMPRESSION_THRESHOLD", 1024))
+REDIS_COMPRESSION_LEVEL = int(os.getenv("REDIS_COMPRESSION_LEVEL", 1))
+
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 1024))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 300))
+AUTH_NEGATIVE_CACHE_TTL = float(os.getenv("AUTH_NEGATIVE_CACHE_TTL", 5))
+
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", 0))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", 32))